@@ -0,0 +1,260 @@
+"""End-to-end throughput benchmark of complete conversations with simulated users.
+
+Every worker process runs conversations between the DialogEngine and a simulated user, which answers
+the state the dialog is in with utterances sampled from dialog_acts.dat and generated from the restaurant
+vocabularies. A conversation walks from 1_welcome through 5_make_suggestion and 6_give_information to exit.
+The conversations are reproducible by seed: the same seed gives the same transcripts (see the transcript
+digest), so the conversations/s can be compared between commits and used as a performance gate.
+
+Run from the root of the repository:
+    python -m benchmarks.dialog_throughput --conversations 2000 --processes 4 --seed 42 --compare previous_results.json
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from dialog_server import DialogEngine
+from intent_classification import CachedIntentClassifier, NaiveBayesPredictor
+from model_store import load_or_train
+from restaurant_snapshot import load_catalog
+from settings import Settings, SettingsManager
+from utils import iter_dialog_acts
+
+
+data_path = Path("./data/dialog_acts.dat")
+artifact_dir = Path("./models")
+restaurants_path = Path("./data/restaurant_info.csv")
+
+
+class SimulatedUser:
+    """A user who answers the dialog system based on the state it is in, driven by a seeded random generator.
+    """
+    # the implication rules the user can ask for, with the words which trigger the extraction
+    requirements = ["touristic", "romantic", "children", "assigned seats"]
+    requirement_words = ["atmosphere", "vibe", "ambiance"]
+    contact_information = ["phone number", "address", "postcode"]
+
+    def __init__(self, rng: random.Random, utterances: Dict[str, List[str]], vocabularies: Dict[str, List[str]], max_requests: int = 2) -> None:
+        """Initialize the user.
+
+        Args:
+            rng (random.Random): The random generator deciding every answer.
+            utterances (Dict[str, List[str]]): The utterances of dialog_acts.dat per dialog act.
+            vocabularies (Dict[str, List[str]]): The areas, cuisines and priceranges of the restaurants.
+            max_requests (int, optional): The maximum number of contact information requests before saying goodbye. Defaults to 2.
+        """
+        self.rng = rng
+        self.utterances = utterances
+        self.vocabularies = vocabularies
+        self.n_requests = rng.randint(1, max_requests)
+
+    def sample(self, dialog_act: str) -> str:
+        return self.rng.choice(self.utterances[dialog_act])
+
+    def inform(self, slots: List[str]) -> str:
+        """Generate an utterance informing the system about some preferences.
+
+        Args:
+            slots (List[str]): The slots to mention, in ("area", "cuisine", "pricerange").
+
+        Returns:
+            str: The utterance.
+        """
+        area, cuisine, pricerange = (self.rng.choice(self.vocabularies[slot]) for slot in ("area", "cuisine", "pricerange"))
+        parts = []
+        if "pricerange" in slots:
+            parts.append(f"a {pricerange} priced")
+        parts.append(f"{cuisine} restaurant" if "cuisine" in slots else "restaurant")
+        if "area" in slots:
+            parts.append(f"in the {area} part of town")
+        return self.rng.choice(["i want ", "i'm looking for ", "i need "]) + " ".join(parts)
+
+    def respond(self, state: str) -> str:
+        """Answer the system in the state of the dialog.
+
+        Args:
+            state (str): The current state of the DialogManager.
+
+        Returns:
+            str: The utterance of the user.
+        """
+        roll = self.rng.random()
+        if state == "1_welcome":
+            if roll < 0.1:
+                return self.sample("hello")
+            return self.inform(self.rng.sample(["area", "cuisine", "pricerange"], self.rng.randint(1, 3)))
+        if state == "2_ask_area":
+            return self.inform(["area"])
+        if state == "3_ask_cuisine":
+            return self.inform(["cuisine"])
+        if state == "4_ask_additional_prefs":
+            if roll < 0.4:
+                return f"i want a {self.rng.choice(self.requirements)} {self.rng.choice(self.requirement_words)}"
+            return self.sample("negate")
+        if state == "5_make_suggestion":
+            if roll < 0.6:
+                return self.sample("affirm")
+            if roll < 0.8:
+                return f"what is the {self.rng.choice(self.contact_information)}"
+            return f"how about {self.rng.choice(self.vocabularies['cuisine'])} food"
+        if state == "6_give_information":
+            if self.n_requests > 0:
+                self.n_requests -= 1
+                return f"what is the {self.rng.choice(self.contact_information)}"
+            return self.sample("bye")
+        return self.sample("bye")
+
+
+def load_utterances() -> Dict[str, List[str]]:
+    """Collect the utterances of dialog_acts.dat per dialog act, in the order of the file.
+
+    Returns:
+        Dict[str, List[str]]: The utterances per dialog act.
+    """
+    utterances: Dict[str, List[str]] = {}
+    for dialog_act, utterance in iter_dialog_acts(data_path):
+        utterances.setdefault(dialog_act, []).append(utterance)
+    return utterances
+
+
+def run_worker(job: Tuple[int, int, int, bool]) -> Dict:
+    """Run conversations with simulated users, runs inside a worker process.
+
+    Args:
+        job (Tuple[int, int, int, bool]): The seed of the worker, the number of conversations, the maximum number of turns per conversation and whether the intent model is cached.
+
+    Returns:
+        Dict: The measurements of the worker.
+    """
+    seed, n_conversations, max_turns, cached = job
+    # the system picks its templates with the global random generator, the user with its own
+    random.seed(seed)
+    rng = random.Random(seed)
+
+    # the default settings: no delay, no text-to-speech
+    settings = SettingsManager()
+    settings.current = Settings()
+    intent_model = load_or_train(NaiveBayesPredictor(), data_path, artifact_dir)
+    if cached:
+        intent_model = CachedIntentClassifier(intent_model)
+    restaurants = load_catalog(restaurants_path, artifact_dir / "restaurant_info.catalog")
+    engine = DialogEngine(intent_model, restaurants, settings=settings, max_sessions=n_conversations + 1)
+    utterances = load_utterances()
+    vocabularies = {field: restaurants.get_vocabulary(field) for field in ("area", "cuisine", "pricerange")}
+
+    latencies: List[float] = []
+    completed, n_turns = 0, 0
+    transcripts = hashlib.sha256()
+    start = time.perf_counter()
+    for _ in range(n_conversations):
+        user = SimulatedUser(rng, utterances, vocabularies)
+        session_id, responses = engine.open_session()
+        dialog_manager = engine.sessions[session_id].dialog_manager
+        for _ in range(max_turns):
+            utterance = user.respond(dialog_manager.get_current_state())
+            turn_start = time.perf_counter()
+            responses = engine.handle(session_id, utterance)
+            latencies.append(time.perf_counter() - turn_start)
+            n_turns += 1
+            transcripts.update("\n".join([utterance] + responses).encode())
+            if session_id not in engine.sessions:
+                completed += 1
+                break
+        engine.close_session(session_id)
+    elapsed = time.perf_counter() - start
+
+    return {"seed": seed, "conversations": n_conversations, "completed": completed, "turns": n_turns, "elapsed_s": elapsed,
+            "latencies": latencies, "transcript_digest": transcripts.hexdigest()}
+
+
+def summarize(results: List[Dict]) -> Dict:
+    """Combine the measurements of the workers.
+
+    Args:
+        results (List[Dict]): The measurements per worker.
+
+    Returns:
+        Dict: The totals, the throughput (summed over the concurrent workers) and the turn latency percentiles.
+    """
+    latencies = np.concatenate([result["latencies"] for result in results]) if results else np.zeros(0)
+    digest = hashlib.sha256("".join(result["transcript_digest"] for result in results).encode()).hexdigest()
+    return {
+        "conversations": sum(result["conversations"] for result in results),
+        "completed": sum(result["completed"] for result in results),
+        "turns": sum(result["turns"] for result in results),
+        "conversations_per_s": sum(result["conversations"] / result["elapsed_s"] for result in results),
+        "turns_per_s": sum(result["turns"] / result["elapsed_s"] for result in results),
+        "turn_p50_ms": float(np.percentile(latencies, 50)) * 1000 if len(latencies) else None,
+        "turn_p90_ms": float(np.percentile(latencies, 90)) * 1000 if len(latencies) else None,
+        "turn_p99_ms": float(np.percentile(latencies, 99)) * 1000 if len(latencies) else None,
+        "transcript_digest": digest,
+    }
+
+
+def print_summary(summary: Dict, previous: Union[Dict, None] = None) -> None:
+    """Print the summary, together with the relative change to a previous summary.
+
+    Args:
+        summary (Dict): The summary of this run.
+        previous (Union[Dict, None], optional): The summary of an earlier run. Defaults to None.
+    """
+    for metric in ["conversations", "completed", "turns", "conversations_per_s", "turns_per_s", "turn_p50_ms", "turn_p90_ms", "turn_p99_ms"]:
+        value = summary[metric]
+        line = f"{metric:<24}{'n/a' if value is None else f'{value:.4g}':>12}"
+        if previous and value is not None and previous.get(metric):
+            line += f" ({(value - previous[metric]) / previous[metric]:+.1%})"
+        print(line)
+    print(f"{'transcript_digest':<24}{summary['transcript_digest'][:16]}")
+    if previous and previous.get("transcript_digest") != summary["transcript_digest"]:
+        print("The transcripts differ from the earlier run, the conversations are not the same.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark complete conversations with simulated users.")
+    parser.add_argument("--conversations", type=int, default=1000, help="number of conversations per worker process")
+    parser.add_argument("--processes", type=int, default=1, help="number of worker processes running conversations at the same time")
+    parser.add_argument("--max-turns", type=int, default=30, help="maximum number of user turns per conversation")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-cache", action="store_true", help="predict every utterance without the prediction cache")
+    parser.add_argument("--output", type=Path, default=Path("dialog_benchmark.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=None, help="fail when the conversations/s dropped by more than this fraction")
+    args = parser.parse_args()
+
+    # make sure the model artifact exists before the workers start, so they only load it
+    load_or_train(NaiveBayesPredictor(), data_path, artifact_dir)
+
+    jobs = [(args.seed + worker, args.conversations, args.max_turns, not args.no_cache) for worker in range(args.processes)]
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=args.processes) as pool:
+        results = pool.map(run_worker, jobs, chunksize=1)
+
+    summary = summarize(results)
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arguments": {"conversations": args.conversations, "processes": args.processes, "max_turns": args.max_turns, "seed": args.seed, "cached": not args.no_cache},
+        "summary": summary,
+        "workers": [{key: value for key, value in result.items() if key != "latencies"} for result in results],
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+    previous = json.loads(args.compare.read_text()).get("summary") if args.compare else None
+    print_summary(summary, previous)
+    print(f"\nThe results have been written to {args.output}")
+
+    if previous and args.max_regression is not None and previous.get("conversations_per_s"):
+        change = (summary["conversations_per_s"] - previous["conversations_per_s"]) / previous["conversations_per_s"]
+        if change < -args.max_regression:
+            print(f"The conversations/s dropped by {-change:.1%}, more than the allowed {args.max_regression:.1%}")
+            sys.exit(1)
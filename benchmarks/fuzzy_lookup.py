@@ -0,0 +1,97 @@
+"""Benchmark of the levenshtein search over a large vocabulary of multi-word names.
+
+Builds a SlotExtractor over a synthetic vocabulary of restaurant names of two or three words, misspells
+names and reports the latency of a single search of the deletion index, the latency of extracting the
+name from an utterance and the share of misspelled names which are recovered. A linear scan over all
+names is timed on the same spans for comparison.
+
+Run from the root of the repository:
+    python -m benchmarks.fuzzy_lookup --names 24000
+"""
+import argparse
+import random
+import string
+import time
+import Levenshtein
+import numpy as np
+
+from typing import Callable, List
+
+from preference_extraction import SlotExtractor
+
+
+def make_names(n_names: int, rng: random.Random) -> List[str]:
+    """Create unique names of two or three pronounceable words.
+    """
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    words = ["".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4))) for _ in range(n_names // 2)]
+    names = set()
+    while len(names) < n_names:
+        names.add(" ".join(rng.sample(words, rng.choice((2, 2, 3)))))
+    return sorted(names)
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    """Make one typo (a substitution, an insertion or a deletion) in every word of a name.
+    """
+    words = []
+    for word in name.split():
+        position = rng.randrange(len(word))
+        letter = rng.choice(string.ascii_lowercase)
+        kind = rng.choice(("substitute", "insert", "delete"))
+        if kind == "substitute":
+            word = word[:position] + letter + word[position + 1:]
+        elif kind == "insert":
+            word = word[:position] + letter + word[position:]
+        elif len(word) > 3:
+            word = word[:position] + word[position + 1:]
+        words.append(word)
+    return " ".join(words)
+
+
+def measure(function: Callable[[str], object], queries: List[str]) -> np.ndarray:
+    """Time every query on its own, in milliseconds.
+    """
+    timings = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        function(query)
+        timings[i] = (time.perf_counter() - start) * 1e3
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the levenshtein search over a large vocabulary of multi-word names.")
+    parser.add_argument("--names", type=int, default=24000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    names = make_names(args.names, rng)
+    start = time.perf_counter()
+    extractor = SlotExtractor({"name": (names, ["restaurant"])})
+    print(f"{len(names)} names, index built in {time.perf_counter() - start:.2f} s")
+
+    targets = rng.sample(names, min(args.queries, len(names)))
+    typos = [misspell(name, rng) for name in targets]
+
+    def search(span: str) -> object:
+        return extractor.fuzzy_index.search(span, extractor.get_max_distance(span))
+
+    def linear_scan(span: str) -> object:
+        max_distance = extractor.get_max_distance(span)
+        return [name for name in names if Levenshtein.distance(span, name, score_cutoff=max_distance) <= max_distance]
+
+    def extract(typo: str) -> object:
+        # without the memoized results, every utterance is looked up again
+        extractor.fuzzy_cache.clear()
+        return extractor.extract(f"i would like to eat at the {typo} restaurant")
+
+    for name, function, queries in [("index search", search, typos), ("linear scan", linear_scan, typos[:200]),
+                                    ("extract", extract, typos)]:
+        timings = measure(function, queries)
+        print(f"{name:<14} p50 {np.percentile(timings, 50):7.3f} ms  p99 {np.percentile(timings, 99):7.3f} ms  ({len(queries)} spans)")
+
+    recovered = [extractor.extract(f"i would like to eat at the {typo} restaurant")[0] == target for target, typo in zip(targets, typos)]
+    print(f"recovered {np.mean(recovered):.1%} of the misspelled names")
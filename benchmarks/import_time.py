@@ -0,0 +1,90 @@
+"""Benchmark of the import time of the modules of the dialog system.
+
+Imports every module in a fresh interpreter with `python -X importtime`, reports the total
+import time together with the most expensive dependencies, and fails when a module pulls in
+a heavy dependency which should only be loaded by the feature that needs it.
+
+Run from the root of the repository:
+    python -m benchmarks.import_time
+"""
+import argparse
+import subprocess
+import sys
+
+from typing import Dict, List, Tuple
+
+
+# the heavy dependencies which may not be imported by a module (as top level package names)
+FORBIDDEN_IMPORTS = {
+    "utils": ["pandas", "sklearn", "spacy", "pyttsx3", "tkinter"],
+    "preference_extraction": ["numpy", "pandas", "sklearn", "spacy", "pyttsx3", "tkinter"],
+    "intent_classification": ["pandas", "sklearn", "spacy", "pyttsx3", "tkinter"],
+    "dialog_management": ["pandas", "sklearn", "spacy", "pyttsx3", "tkinter"],
+    "speech": ["pyttsx3"],
+    "main": ["pandas", "sklearn", "spacy", "pyttsx3", "tkinter"],
+}
+
+
+def measure_imports(module: str) -> List[Tuple[str, int, int]]:
+    """Import a module in a fresh interpreter and collect the import times.
+
+    Args:
+        module (str): The name of the module.
+
+    Returns:
+        List[Tuple[str, int, int]]: The imported modules with their own and their cumulative import time in microseconds.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{process.stderr}")
+
+    imports = []
+    for line in process.stderr.splitlines():
+        # the lines look like 'import time:  self [us] | cumulative | imported package'
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((name.strip(), int(own), int(cumulative)))
+    return imports
+
+
+def summarize(imports: List[Tuple[str, int, int]], top: int) -> Tuple[int, List[Tuple[str, int]]]:
+    """Summarize the import times per top level package.
+
+    Args:
+        imports (List[Tuple[str, int, int]]): The import times as collected by measure_imports.
+        top (int): The number of most expensive packages to return.
+
+    Returns:
+        Tuple[int, List[Tuple[str, int]]]: The total import time and the most expensive top level packages, in microseconds.
+    """
+    per_package: Dict[str, int] = {}
+    for name, own, _ in imports:
+        package = name.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + own
+    total = sum(per_package.values())
+    return total, sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the import time of the modules of the dialog system.")
+    parser.add_argument("--modules", nargs="+", default=list(FORBIDDEN_IMPORTS))
+    parser.add_argument("--top", type=int, default=5, help="number of most expensive packages to show")
+    args = parser.parse_args()
+
+    violations = []
+    for module in args.modules:
+        imports = measure_imports(module)
+        total, expensive = summarize(imports, args.top)
+        print(f"{module}: {total / 1000:.1f} ms")
+        for package, own in expensive:
+            print(f"    {package:<28}{own / 1000:8.1f} ms")
+
+        imported_packages = {name.split(".")[0] for name, _, _ in imports}
+        for package in FORBIDDEN_IMPORTS.get(module, []):
+            if package in imported_packages:
+                violations.append(f"importing {module} also imports {package}")
+
+    if violations:
+        print("\n" + "\n".join(violations))
+        sys.exit(1)
@@ -0,0 +1,193 @@
+"""Benchmark of the intent classifiers.
+
+Trains and evaluates every model on every dataset in parallel, each in a fresh worker process,
+and reports the quality, the fit time, the single utterance predict latency, the predict_batch
+throughput and the peak memory of the worker. The results are written to a JSON file, which can
+be compared against the results of another commit.
+
+Run from the root of the repository:
+    python -m benchmarks.intent_models --output results.json --compare previous_results.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+import traceback
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
+import intent_classification
+from utils import load_restaurant_train_test_split
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+MODELS = {
+    "most_occuring": "MostOccuringBaselinePredictor",
+    "rule_based": "RuleBasedBaselinePredictor",
+    "naive_bayes": "NaiveBayesPredictor",
+    "incremental_naive_bayes": "IncrementalNaiveBayesPredictor",
+    "knn": "KNNPredictor",
+}
+DATASETS = ("pkl", "dat")
+
+
+def load_dataset(dataset: str) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """Load the train and test data of a dataset.
+
+    Args:
+        dataset (str): Either "pkl" for the pickled train/test dialogs or "dat" for a split of dialog_acts.dat.
+
+    Returns:
+        Tuple[List[str], List[str], List[str], List[str]]: The train utterances and labels, and the test utterances and labels.
+    """
+    if dataset == "pkl":
+        train_df = pd.read_pickle(Path("./data/training_dialog.pkl"))
+        test_df = pd.read_pickle(Path("./data/test_dialog.pkl"))
+    else:
+        train_df, test_df = load_restaurant_train_test_split(Path("./data/dialog_acts.dat"))
+
+    return train_df["utterance_content"].to_list(), train_df["dialog_act"].to_list(), \
+        test_df["utterance_content"].to_list(), test_df["dialog_act"].to_list()
+
+
+def get_peak_rss_mb() -> Union[float, None]:
+    """Get the peak resident set size of the current process.
+
+    Returns:
+        Union[float, None]: The peak RSS in megabytes or None when it cannot be measured.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macOS reports bytes
+    return peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024
+
+
+def run_benchmark(job: Tuple[str, str, int]) -> Dict:
+    """Train and evaluate a single model on a single dataset, runs inside a worker process.
+
+    Args:
+        job (Tuple[str, str, int]): The model key, the dataset and the number of single utterance predictions to time.
+
+    Returns:
+        Dict: The measurements of the model.
+    """
+    model_key, dataset, latency_samples = job
+    result = {"model": model_key, "dataset": dataset}
+    try:
+        X_train, y_train, X_test, y_test = load_dataset(dataset)
+        model = getattr(intent_classification, MODELS[model_key])()
+        result["name"] = model.name
+
+        # the time it takes to train the model
+        start = time.perf_counter()
+        model.train(X_train, y_train)
+        result["fit_time_s"] = time.perf_counter() - start
+
+        # the throughput of predicting the whole test set at once
+        start = time.perf_counter()
+        y_pred = model.predict_batch(X_test)
+        batch_time = time.perf_counter() - start
+        result["predict_batch_per_s"] = len(X_test) / batch_time
+
+        # the quality of the predictions
+        result["accuracy"] = accuracy_score(y_test, y_pred)
+        precision, recall, fscore, _ = precision_recall_fscore_support(y_test, y_pred, average="weighted", zero_division=0)
+        result.update({"precision": precision, "recall": recall, "fscore": fscore})
+
+        # the latency of predicting a single utterance, like during a dialog turn
+        latencies = []
+        for utterance in X_test[:latency_samples]:
+            start = time.perf_counter()
+            model.predict(utterance)
+            latencies.append(time.perf_counter() - start)
+        result["predict_p50_ms"] = float(np.percentile(latencies, 50)) * 1000
+        result["predict_p99_ms"] = float(np.percentile(latencies, 99)) * 1000
+
+        result["peak_rss_mb"] = get_peak_rss_mb()
+    except Exception:
+        # a model which cannot run (e.g. a missing spaCy model) should not stop the other benchmarks
+        result["error"] = traceback.format_exc(limit=1).strip().splitlines()[-1]
+    return result
+
+
+def get_commit() -> Union[str, None]:
+    """Get the commit the benchmark runs on.
+
+    Returns:
+        Union[str, None]: The hash of the current git commit or None outside of a repository.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: List[Dict], previous: Union[List[Dict], None] = None) -> None:
+    """Print the results as a table, together with the relative change to previous results.
+
+    Args:
+        results (List[Dict]): The measurements per model and dataset.
+        previous (Union[List[Dict], None], optional): The measurements of an earlier run. Defaults to None.
+    """
+    metrics = ["accuracy", "fscore", "fit_time_s", "predict_p50_ms", "predict_p99_ms", "predict_batch_per_s", "peak_rss_mb"]
+    previous_by_key = {(result["model"], result["dataset"]): result for result in previous or []}
+
+    print(f"{'model':<16}{'dataset':<9}" + "".join(f"{metric:>22}" for metric in metrics))
+    for result in results:
+        line = f"{result['model']:<16}{result['dataset']:<9}"
+        if "error" in result:
+            print(line + f"  error: {result['error']}")
+            continue
+
+        old = previous_by_key.get((result["model"], result["dataset"]), {})
+        for metric in metrics:
+            value = result.get(metric)
+            cell = "n/a" if value is None else f"{value:.4g}"
+            if value is not None and old.get(metric):
+                cell += f" ({(value - old[metric]) / old[metric]:+.1%})"
+            line += f"{cell:>22}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the intent classifiers.")
+    parser.add_argument("--models", nargs="+", choices=list(MODELS), default=list(MODELS))
+    parser.add_argument("--datasets", nargs="+", choices=DATASETS, default=list(DATASETS))
+    parser.add_argument("--latency-samples", type=int, default=1000, help="number of single utterance predictions to time")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes, defaults to the number of cpus")
+    parser.add_argument("--output", type=Path, default=Path("intent_benchmark.json"))
+    parser.add_argument("--compare", type=Path, default=None, help="results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    jobs = [(model_key, dataset, args.latency_samples) for model_key in args.models for dataset in args.datasets]
+
+    # every job gets a fresh process, so the peak memory of one model does not leak into the next
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes=args.processes, maxtasksperchild=1) as pool:
+        results = pool.map(run_benchmark, jobs, chunksize=1)
+
+    report = {
+        "commit": get_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+    previous = json.loads(args.compare.read_text()).get("results") if args.compare else None
+    print_results(results, previous)
+    print(f"\nThe results have been written to {args.output}")
@@ -0,0 +1,57 @@
+"""Microbenchmark of the per-turn overhead of reading the configurable variables.
+
+Compares calling decouple.config for every variable (as the DialogManager used to do)
+with reading the attributes of the settings snapshot held by the SettingsManager.
+
+Run from the root of the repository:
+    python -m benchmarks.settings_overhead
+"""
+import argparse
+import timeit
+
+from decouple import config
+from pathlib import Path
+
+from settings import SettingsManager
+
+
+def read_with_decouple() -> None:
+    """The variables read during one turn using decouple.config.
+    """
+    config('allow_restart', cast=bool)
+    config('use_tts', cast=bool)
+    config('formal', cast=bool)
+    config('use_delay', cast=bool)
+    config('use_caps', cast=bool)
+    config('levenshtein_distance', cast=int)
+    config('debug', cast=bool)
+
+
+def make_read_with_settings(settings: SettingsManager):
+    """Create the function reading the variables of one turn from the settings snapshot.
+    """
+    def read_with_settings() -> None:
+        current = settings.current
+        current.allow_restart
+        current.use_tts
+        current.formal
+        current.use_delay
+        current.use_caps
+        current.levenshtein_distance
+        current.debug
+    return read_with_settings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the per-turn overhead of reading the settings.")
+    parser.add_argument("--turns", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    settings = SettingsManager(Path(".env"))
+    candidates = [("decouple.config", read_with_decouple), ("Settings", make_read_with_settings(settings))]
+
+    for name, function in candidates:
+        # take the best of the repeats to reduce the noise
+        best = min(timeit.repeat(function, number=args.turns, repeat=args.repeat))
+        print(f"{name:<16} {best / args.turns * 1e6:8.3f} us/turn")
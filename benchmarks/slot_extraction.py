@@ -0,0 +1,112 @@
+"""Comparison of the SlotExtractor with the original find_preference on the utterances of dialog_acts.dat.
+
+Extracts the preference slots of every unique utterance with both, reports the time per utterance
+and lists the utterances for which the results differ: the SlotExtractor caps the levenshtein distance
+at the maximum distance of its deletion index and also matches options of several words.
+
+Run from the root of the repository:
+    python -m benchmarks.slot_extraction --distances 0 1 2 --show 20
+"""
+import argparse
+import time
+import Levenshtein
+import numpy as np
+
+from pathlib import Path
+from typing import List, Tuple, Union
+
+from dialog_management import DialogManager
+from restaurant_snapshot import load_catalog
+from settings import SettingsManager
+
+
+def find_preference(options: List[str], user_utterance: str, patterns: List[str] = [], max_levenshtein: int = 0) -> Union[str, None]:
+    """Finds the preference in a sentence out of a list with options and the levenshtein distance.
+    The original extraction of a single slot, which the SlotExtractor replaced.
+
+    Args:
+        options (List[str]): a list of options for which we search in the text.
+        user_utterance (str): The input from the user.
+        patterns (List[str], optional): a list of the pattern options to potentially match, optional in case of not area, cuisine or pricerange.
+        max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
+
+    Returns:
+        Union[str, None]: returns either the best found match or None.
+    """
+    smallest_distance = np.inf
+    best: str = None
+    pref = None
+    prev_word = ""
+    for option in options:
+        if option in user_utterance and option != "any":
+            # an exact match has been found
+            pref = option
+            return pref
+    # pattern matching
+    for word in user_utterance.split():
+        if word in patterns:
+            if prev_word == "any":
+                return "any"
+            break
+        prev_word = word
+    # levenshtein distance below maximum
+    for option in options:
+        distance = Levenshtein.distance(prev_word, option)
+        if distance < smallest_distance:
+            # if not defined
+            if max_levenshtein == 0:
+                max_levenshtein = len(prev_word)/2
+            smallest_distance = distance
+            best = option
+    # If there is an option for levenshtein
+    if best:
+        if smallest_distance < max_levenshtein:
+            pref = best
+    return pref
+
+
+def load_utterances(file_path: Path) -> List[str]:
+    """Read the unique utterances of the dialog acts corpus, in the order they first occur.
+    """
+    with open(file_path) as f:
+        return list(dict.fromkeys(line.split(" ", 1)[1].strip() for line in f if " " in line.strip()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the SlotExtractor with the original find_preference.")
+    parser.add_argument("--distances", type=int, nargs="+", default=[0], help="the levenshtein_distance settings to compare, 0 is the dynamic distance")
+    parser.add_argument("--show", type=int, default=10, help="the number of differing utterances to list per distance")
+    args = parser.parse_args()
+
+    restaurants = load_catalog(Path("./data/restaurant_info.csv"), Path("./models/restaurant_info.catalog"))
+    dialog_manager = DialogManager("1_welcome", None, restaurants, settings=SettingsManager())
+    slots = [
+        ("area", dialog_manager.unique_areas, dialog_manager.area_patterns),
+        ("cuisine", dialog_manager.unique_cuisines, dialog_manager.cuisine_patterns),
+        ("pricerange", dialog_manager.unique_priceranges, dialog_manager.pricerange_patterns),
+        ("additional_requirement", dialog_manager.unique_additional_requirements, dialog_manager.implication_patterns),
+    ]
+    extractor = dialog_manager.slot_extractor
+    utterances = load_utterances(Path("./data/dialog_acts.dat"))
+
+    for max_levenshtein in args.distances:
+        start = time.perf_counter()
+        expected = [tuple(find_preference(options, utterance, patterns, max_levenshtein) for _, options, patterns in slots) for utterance in utterances]
+        baseline_time = time.perf_counter() - start
+        # without the memoized results of an earlier distance
+        extractor.fuzzy_cache.clear()
+        start = time.perf_counter()
+        found = extractor.extract_batch(utterances, max_levenshtein)
+        extractor_time = time.perf_counter() - start
+
+        differences: List[Tuple[str, str, Union[str, None], Union[str, None]]] = [
+            (utterance, name, old, new)
+            for utterance, old_slots, new_slots in zip(utterances, expected, found)
+            for (name, _, _), old, new in zip(slots, old_slots, new_slots) if old != new]
+        lost = sum(new is None for _, _, _, new in differences)
+        gained = sum(old is None for _, _, old, _ in differences)
+        print(f"levenshtein_distance {max_levenshtein}: {len(utterances)} utterances, "
+              f"find_preference {baseline_time / len(utterances) * 1e6:.1f} us, SlotExtractor {extractor_time / len(utterances) * 1e6:.1f} us per utterance")
+        print(f"  {len(differences)} slots differ: {lost} no longer matched, {gained} newly matched, {len(differences) - lost - gained} matched differently")
+        for utterance, name, old, new in differences[:args.show]:
+            print(f"  {utterance!r:<60} {name:<24} {old} -> {new}")
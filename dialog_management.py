@@ -1,14 +1,19 @@
-import time
-import pyttsx3
 import random
 
 from dataclasses import dataclass
-from decouple import config
-from typing import List, Tuple, Union
+from typing import Dict, List, Set, Tuple, Union
 
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from settings import Settings, SettingsManager
 from utils import Restaurant
-from preference_extraction import find_preference
-from intent_classification import IntentClassifier
+from restaurant_catalog import RestaurantCatalog
+from restaurant_index import RestaurantIndex
+from implication_rules import ImplicationRules
+from restaurant_recommender import RankingCache, Recommendations, Recommender
+from response_templates import compile_templates
+from dialog_policy import ANY, DialogPolicy, Transition
+from preference_extraction import SlotExtractor
+from intent_classification import DIALOG_ACTS, IntentClassifier
 
 
 dialog_choices = {
@@ -39,8 +44,12 @@ dialog_choices = {
             "Goodbye, I hope I have been of assistance to you."],
         13: ["Sorry, I couldn't understand that.",
             "I'm sorry, I was not able to interpret that."],
-        14: ["Excuse me, did you mean <preference>?"
+        14: ["Excuse me, did you mean <preference>?",
             "Sorry, did you mean <preference>?"],
+        15: ["There is no restaurant matching all your preferences, but <name> in the <area> of town with <pricerange> prices comes close.",
+            "No restaurant matches your description exactly, the closest is <name> in the <area> part of the city, which handles <pricerange> prices."],
+        16: ["A restaurant cannot be <requirement> and <conflict> at the same time, so I will look for a <requirement> one instead.",
+            "I'm sorry but <requirement> and <conflict> cannot be combined, I will only keep <requirement>."],
     },
     "informal": {
         1 : ["Howdy, let's choose a restaurant! Where do you want to eat? Area, food type, price range?",
@@ -70,10 +79,18 @@ dialog_choices = {
             "BYE, THANKS!!"],
         13: ["Couldn't understand that, come again?",
             "No clue, come again?"],
-        14: ["Do you mean <preference>?"
+        14: ["Do you mean <preference>?",
             "Wait, do you mean <preference>?"],
+        15: ["Nothing fits exactly, but <name> in the <area> with <pricerange> food comes close.",
+            "Close enough? <name> in the <area> of the city with a <pricerange> price"],
+        16: ["Can't be <requirement> and <conflict> at once, going with <requirement>!",
+            "<requirement> and <conflict>? That won't work, sticking with <requirement>."],
     }
 }
+# the templates of the system utterances, compiled once
+response_templates = compile_templates(dialog_choices)
+# the delay in seconds before every system utterance when use_delay is on, applied by whoever presents the utterances (the CLI or the server)
+RESPONSE_DELAY = 0.5
 
 
 @dataclass
@@ -83,7 +100,8 @@ class UserPreference:
     area: str = None
     cuisine: str = None
     pricerange: str = None
-    additional_requirement: str = None
+    # the additional requirements which do not conflict, ("any",) when the user has none
+    additional_requirements: Tuple[str, ...] = ()
 
     def has_unfilled_preferences(self) -> bool:
         """Check whether there are still unfilled preferences left.
@@ -91,76 +109,101 @@ class UserPreference:
         Returns:
             bool: whether the user has unfilled preferences.
         """
-        return not (self.area and self.cuisine and self.pricerange and self.additional_requirement)
+        return not (self.area and self.cuisine and self.pricerange and self.additional_requirements)
     
     def fill_preferences(self) -> None:
         """Fills the remaining preferences so we can give a recommendation.
         """
         if not self.pricerange:
             self.pricerange = "any"
-        if not self.additional_requirement:
-            self.additional_requirement = "any"
+        if not self.additional_requirements:
+            self.additional_requirements = ("any",)
+
+    def get_requirements(self) -> Tuple[str, ...]:
+        """Get the additional requirements the restaurants should meet.
+
+        Returns:
+            Tuple[str, ...]: The additional requirements, without "any".
+        """
+        return tuple(requirement for requirement in self.additional_requirements if requirement != "any")
 
     def __str__(self) -> str:
-        return f"(area: {self.area}; cuisine: {self.cuisine}; pricerange: {self.pricerange}; additional_reqs: {self.additional_requirement})"
+        return f"(area: {self.area}; cuisine: {self.cuisine}; pricerange: {self.pricerange}; additional_reqs: {', '.join(self.additional_requirements) or None})"
 
 
 class DialogManager:
     """The class for the DialogManager, the brains of the dialogue.
+    The DialogManager does no input or output itself, the system utterances are returned as values.
     """
-    def __init__(self, initial_state: str, intent_model: IntentClassifier, restaurants: List[Restaurant]) -> None:
+    def __init__(self, initial_state: str, intent_model: IntentClassifier, restaurants: Union[RestaurantCatalog, List[Restaurant]], restaurant_index: RestaurantIndex = None,
+                    recommender: Recommender = None, implication_rules: ImplicationRules = None, slot_extractor: SlotExtractor = None, request_extractor: SlotExtractor = None,
+                    settings: SettingsManager = None, instrumentation: Instrumentation = NULL_INSTRUMENTATION) -> None:
         """_summary_
 
         Args:
             initial_state (str): The initial state of the dialog.
             intent_model (IntentClassifier): The intent classifier to use.
-            restaurants (List[Restaurant]): A list of possible restaurants to choose from.
+            restaurants (Union[RestaurantCatalog, List[Restaurant]]): The catalog of possible restaurants to choose from, a list is converted into a catalog.
+            restaurant_index (RestaurantIndex, optional): The index over the restaurants, built from the restaurants when None. Defaults to None.
+            recommender (Recommender, optional): The ranking of the restaurants, built from the index when None. Defaults to None.
+            implication_rules (ImplicationRules, optional): The compiled rules of the additional requirements, loaded from ./data/implication_rules.json when None. Defaults to None.
+            slot_extractor (SlotExtractor, optional): The extractor for the preference slots, built from the restaurants when None. Defaults to None.
+            request_extractor (SlotExtractor, optional): The extractor for the requested contact information, built when None. Defaults to None.
+            settings (SettingsManager, optional): The holder of the current settings, loaded from the .env file when None. Defaults to None.
+            instrumentation (Instrumentation, optional): Where the timings and counters of the turns are recorded. Defaults to NULL_INSTRUMENTATION (disabled).
         """
         self.state = initial_state
         self.intent_model = intent_model
         self.user_preferences = UserPreference()
         self.demand_answer = True
-        # variables regarding the restaurants information
+        # the system utterances which have not been handed out yet
+        self.responses: List[str] = []
+        # variables regarding the restaurants information (the catalog is shared and never mutated)
+        if not isinstance(restaurants, RestaurantCatalog):
+            restaurants = RestaurantCatalog.from_restaurants(restaurants)
         self.restaurants = restaurants
-        self.remaining_restaurants = restaurants
+        self.restaurant_index = restaurant_index if restaurant_index is not None else RestaurantIndex(restaurants)
+        self.recommender = recommender if recommender is not None else Recommender(self.restaurant_index)
+        # the ranking state of this session (empty until the first suggestion), the ranked restaurants for the current preferences and the ids of the restaurants suggested during this session
+        self.ranking = RankingCache(self.recommender)
+        self.recommendations: Union[Recommendations, None] = None
+        self.suggested_restaurants: Set[int] = set()
         self.chosen_restaurant = None
+        # whether the chosen restaurant has all antecedents of the additional requirement (so the choice can be explained)
+        self.chosen_meets_requirement = False
+        # the suggestion before the chosen restaurant, suggested again when there are no restaurants left
         self.old_restaurant = None
+        self.old_meets_requirement = False
+        # the settings are read once per turn from the (hot reloadable) holder
+        self.settings = settings if settings is not None else SettingsManager()
+        self.instrumentation = instrumentation
         # variables regarding preference searching
-        self.max_levenshtein = config('levenshtein_distance', cast=int)
-        self.unique_areas = list(set([rest.area for rest in self.restaurants if rest.area != ""]))
-        self.unique_cuisines = list(set([rest.cuisine for rest in self.restaurants if rest.cuisine != ""]))
-        self.unique_priceranges = list(set([rest.pricerange for rest in self.restaurants if rest.pricerange != ""]))
+        self.unique_areas = self.restaurants.get_vocabulary("area")
+        self.unique_cuisines = self.restaurants.get_vocabulary("cuisine")
+        self.unique_priceranges = self.restaurants.get_vocabulary("pricerange")
         self.contact_information = ["phone", "address", "postcode"]
         # patterns
         self.area_patterns = ["part", "side", "area"]
         self.cuisine_patterns = ["restaurant", "cuisine", "food", "type"]
         self.pricerange_patterns = ["pricerange", "price", "priced", "restaurant"] + self.unique_cuisines
         self.implication_patterns = ["vibe", "ambiance", "atmosphere"]
-        # implication rules
-        self.implication_rules = {
-            "touristic": {
-                "antecedents": ["cheap", "good food"],
-                "texts": ["touristic", "is cheap", "has good food"]},
-            "untouristic": {
-                "antecedents": ["romanian"],
-                "texts": ["is not touristic"]},
-            "assigned seats": {
-                "antecedents": ["busy"],
-                "texts": ["reservation only", "is busy"]},
-            "children": {
-                "antecedents": ["short stay"],
-                "texts": ["child-friendly", "is catered to short-stay"]},
-            "no children": {
-                "antecedents": ["long stay"],
-                "texts": ["not child-friendly", "is catered to long-stay"]},
-            "romantic": {
-                "antecedents": ["not busy"],
-                "texts": ["romantic", "is not busy"]},
-            "unromantic": {
-                "antecedents": ["busy", "short stay"],
-                "texts": ["not romantic", "is busy", "is catered to short-stay"]}
-            }
-        self.unique_additional_requirements = list(set(self.implication_rules.keys()))
+        # implication rules, compiled once over the restaurants
+        if implication_rules is None:
+            implication_rules = ImplicationRules.from_json("./data/implication_rules.json", self.restaurant_index)
+        self.implication_rules = implication_rules
+        self.unique_additional_requirements = list(self.implication_rules.names)
+        # the extractors for all preference slots at once and for the requested contact information
+        if slot_extractor is None:
+            slot_extractor = SlotExtractor({
+                "area": (self.unique_areas, self.area_patterns),
+                "cuisine": (self.unique_cuisines, self.cuisine_patterns),
+                "pricerange": (self.unique_priceranges, self.pricerange_patterns),
+                "additional_requirement": (self.unique_additional_requirements, self.implication_patterns),
+            })
+        self.slot_extractor = slot_extractor
+        if request_extractor is None:
+            request_extractor = SlotExtractor({"request": (self.contact_information, [])})
+        self.request_extractor = request_extractor
     
     def get_current_state(self) -> str:
         """getter function for getting the state.
@@ -170,164 +213,185 @@ class DialogManager:
         """
         return self.state
 
+    def pop_responses(self) -> List[str]:
+        """Hand out the system utterances produced since the last call.
+
+        Returns:
+            List[str]: The system utterances in the order they were produced.
+        """
+        responses = self.responses
+        self.responses = []
+        return responses
+
 
-    def next_state(self, user_utterance: str) -> None:
+    def next_state(self, user_utterance: str) -> List[str]:
         """This function uses the current state and the input from the user to set the next state.
 
         Args:
             user_utterance (str): the input from the user.
+
+        Returns:
+            List[str]: The system utterances produced during this step.
         """
-        # predict the state based on the user input
-        dialog_act = self.intent_model.predict(user_utterance)
-        # print(f"dialog act: {dialog_act}")
-
-        if dialog_act in ("bye", "thankyou"):
-            self.state = "exit"
-        
-        elif config('allow_restart', cast=bool) and (dialog_act == "restart" or user_utterance in ("restart", "start over")):
-            # immediately restart the dialogue from the beginning and erase all gathered information
-            self.user_preferences = UserPreference()
-            self.chosen_restaurant = None
-            self.state == "1_welcome"
-            self.run_system_response(1)
-
-
-        elif self.state == "1_welcome":
-            if dialog_act == "hello":
-                self.state = "1_welcome"
-                self.demand_answer = True
-
-            if dialog_act == "inform":
-                # extract and update the preferences of the user
-                preferences = self.extract_preferences(user_utterance)
-                self.update_user_preferences(preferences)
-
-            if not self.user_preferences.area:
-                # ask for the area preference
-                self.state = "2_ask_area"
-                self.run_system_response(2)
-                self.demand_answer = True
-
-            elif not self.user_preferences.cuisine:
-                # ask for the area preference
-                self.state = "3_ask_cuisine"
-                self.run_system_response(3)
-                self.demand_answer = True
-            
-            elif self.user_preferences.has_unfilled_preferences():
-                # ask the user for additional preferences
-                self.state = "4_ask_additional_prefs"
-                self.run_system_response(4)
-                self.demand_answer = True
-            else:
-                # got all information, now make a suggestion
-                self.state = "5_make_suggestion"
-                # filter on the restaurants
-                self.filter_restaurants()
-                self.demand_answer = False
+        instrumentation = self.instrumentation
+        with instrumentation.span("next_state"):
+            previous_state = self.state
 
+            # predict the state based on the user input
+            with instrumentation.span("predict_intent"):
+                dialog_act = self.intent_model.predict(user_utterance)
+            # print(f"dialog act: {dialog_act}")
 
-        elif self.state == "2_ask_area":
-            if dialog_act == "inform":
-                # extract and update the preferences of the user
-                preferences = self.extract_preferences(user_utterance)
-                self.update_user_preferences(preferences)
+            self.transition(user_utterance, dialog_act)
+            instrumentation.count("dialog_acts", dialog_act)
+            instrumentation.count("transitions", f"{previous_state} -> {self.state}")
 
-            self.state = "1_welcome"
-            self.demand_answer = False
+        return self.pop_responses()
 
+    def transition(self, user_utterance: str, dialog_act: str) -> None:
+        """Set the next state from the current state, the input from the user and its dialog act, as given by the dialog policy.
 
-        elif self.state == "3_ask_cuisine":
-            if dialog_act == "inform":
-                # extract and update the preferences of the user
-                preferences = self.extract_preferences(user_utterance)
-                self.update_user_preferences(preferences)
-            
-            self.state = "1_welcome"
-            self.demand_answer = False
+        Args:
+            user_utterance (str): the input from the user.
+            dialog_act (str): the predicted dialog act of the input.
+        """
+        for guard, action in dialog_policy.dispatch(self.state, dialog_act):
+            if guard is None or guard(self, user_utterance, dialog_act):
+                action(self, user_utterance, dialog_act)
+                return
+
+    # the guards and actions of the dialog policy, all called with the user utterance and its dialog act
 
+    def wants_restart(self, user_utterance: str, dialog_act: str) -> bool:
+        return self.settings.current.allow_restart and (dialog_act == "restart" or user_utterance in ("restart", "start over"))
 
-        elif self.state == "4_ask_additional_prefs":
-            if dialog_act == "inform":
-                # extract and update the preferences of the user
-                preferences = self.extract_preferences(user_utterance)
-                self.update_user_preferences(preferences)
-            
-            # after we asked for additional preferences fill the remaining spots with 'any', since the user doesn't care about those
-            self.user_preferences.fill_preferences()
-            self.state = "1_welcome"
+    def end_dialog(self, user_utterance: str, dialog_act: str) -> None:
+        self.state = "exit"
+
+    def restart(self, user_utterance: str, dialog_act: str) -> None:
+        # immediately restart the dialogue from the beginning and erase all gathered information
+        self.user_preferences = UserPreference()
+        self.ranking = RankingCache(self.recommender)
+        self.recommendations = None
+        self.suggested_restaurants = set()
+        self.chosen_restaurant = None
+        self.old_restaurant = None
+        self.state = "1_welcome"
+        self.run_system_response(1)
+
+    def inform_and_ask_next_preference(self, user_utterance: str, dialog_act: str) -> None:
+        # extract and update the preferences of the user
+        self.update_user_preferences(self.extract_preferences(user_utterance))
+        self.ask_next_preference(user_utterance, dialog_act)
+
+    def ask_next_preference(self, user_utterance: str, dialog_act: str) -> None:
+        if not self.user_preferences.area:
+            # ask for the area preference
+            self.state = "2_ask_area"
+            self.run_system_response(2)
+            self.demand_answer = True
+
+        elif not self.user_preferences.cuisine:
+            # ask for the area preference
+            self.state = "3_ask_cuisine"
+            self.run_system_response(3)
+            self.demand_answer = True
+
+        elif self.user_preferences.has_unfilled_preferences():
+            # ask the user for additional preferences
+            self.state = "4_ask_additional_prefs"
+            self.run_system_response(4)
+            self.demand_answer = True
+        else:
+            # got all information, now make a suggestion
+            self.state = "5_make_suggestion"
+            # filter on the restaurants
+            self.filter_restaurants()
             self.demand_answer = False
 
+    def inform_and_return_to_welcome(self, user_utterance: str, dialog_act: str) -> None:
+        # extract and update the preferences of the user
+        self.update_user_preferences(self.extract_preferences(user_utterance))
+        self.return_to_welcome(user_utterance, dialog_act)
 
-        elif self.state == "5_make_suggestion":
-            
-            if dialog_act in ("ack", "affirm"):
-                self.state = "6_give_information"
-                self.run_system_response(7)
-                self.demand_answer = True
-            
-            elif dialog_act == "request":
-                self.state = "6_give_information"
-                self.demand_answer = False
-            
-            else:
-                if dialog_act in ("inform", "reqalts"):
-                    # extract and update the preferences of the user
-                    preferences = self.extract_preferences(user_utterance)
-                    self.update_user_preferences(preferences)
-
-                    # filter on the restaurants
-                    self.filter_restaurants()
-
-                if not self.remaining_restaurants:
-                    # no restaurants found
-                    if self.old_restaurant:
-                        # during the previous round we already had a restaurant
-                        self.chosen_restaurant = self.old_restaurant
-                        self.run_system_response(5)
-                    else:
-                        # no restaurants to choose from
-                        self.run_system_response(6)
-                        self.demand_answer = True
-
-                else:
-                    # there are one/some restaurants available
-                    self.old_restaurant = self.chosen_restaurant
-                    self.chosen_restaurant = self.remaining_restaurants.pop()
-                    if self.old_restaurant == self.chosen_restaurant:
-                        self.run_system_response(6)
-
-                    else:
-                        # ask the user for their response
-                        self.run_system_response(5)
-                        self.demand_answer = True
-
-
-        elif self.state == "6_give_information":
-            if dialog_act == "request":
-                # the user wants some information
-                req = find_preference(self.contact_information, user_utterance, max_levenshtein=self.max_levenshtein)
-                if req == "phone":
-                    # the user wants the phone number
-                    self.run_system_response(9)
-                elif req == "address":
-                    # the user wants the address
-                    self.run_system_response(8)
-                elif req == "postcode":
-                    # the user wants the postcode
-                    self.run_system_response(10)
-                else:
-                    # couldn't understand
-                    self.run_system_response(13)
-                
-                self.run_system_response(11)
-                self.demand_answer = True
-                
+    def return_to_welcome(self, user_utterance: str, dialog_act: str) -> None:
+        self.state = "1_welcome"
+        self.demand_answer = False
+
+    def inform_and_fill_preferences(self, user_utterance: str, dialog_act: str) -> None:
+        # extract and update the preferences of the user
+        self.update_user_preferences(self.extract_preferences(user_utterance))
+        self.fill_preferences(user_utterance, dialog_act)
+
+    def fill_preferences(self, user_utterance: str, dialog_act: str) -> None:
+        # after we asked for additional preferences fill the remaining spots with 'any', since the user doesn't care about those
+        self.user_preferences.fill_preferences()
+        self.return_to_welcome(user_utterance, dialog_act)
+
+    def offer_information(self, user_utterance: str, dialog_act: str) -> None:
+        self.state = "6_give_information"
+        self.run_system_response(7)
+        self.demand_answer = True
+
+    def move_to_information(self, user_utterance: str, dialog_act: str) -> None:
+        self.state = "6_give_information"
+        self.demand_answer = False
+
+    def inform_and_suggest(self, user_utterance: str, dialog_act: str) -> None:
+        # extract and update the preferences of the user
+        previous_preferences = str(self.user_preferences)
+        self.update_user_preferences(self.extract_preferences(user_utterance))
+        if self.recommendations is None or str(self.user_preferences) != previous_preferences:
+            # rank the restaurants again, otherwise the user gets the next best restaurant for the same preferences
+            self.filter_restaurants()
+        self.suggest(user_utterance, dialog_act)
+
+    def suggest(self, user_utterance: str, dialog_act: str) -> None:
+        recommendation = next(self.recommendations, None) if self.recommendations is not None else None
+        if recommendation is None:
+            # no (more) restaurants to choose from
+            if self.old_restaurant:
+                # suggest the restaurant of the previous round again
+                self.chosen_restaurant = self.old_restaurant
+                self.chosen_meets_requirement = self.old_meets_requirement
+                self.run_system_response(5)
             else:
-                # the user is satisfied and we can say goodbye
-                self.run_system_response(12)
-                self.state = "exit"
+                self.run_system_response(6)
+        else:
+            self.old_restaurant = self.chosen_restaurant
+            self.old_meets_requirement = self.chosen_meets_requirement
+            self.chosen_restaurant = recommendation.restaurant
+            self.chosen_meets_requirement = recommendation.meets_requirement
+            self.suggested_restaurants.add(recommendation.restaurant.restaurant_id)
+            # suggest the restaurant, saying so when it does not match all preferences
+            self.run_system_response(5 if recommendation.exact else 15)
+        # ask the user for their response
+        self.demand_answer = True
 
+    def give_information(self, user_utterance: str, dialog_act: str) -> None:
+        # the user wants some information
+        with self.instrumentation.span("extract_request"):
+            req, = self.request_extractor.extract(user_utterance, max_levenshtein=self.settings.current.levenshtein_distance)
+        if req == "phone":
+            # the user wants the phone number
+            self.run_system_response(9)
+        elif req == "address":
+            # the user wants the address
+            self.run_system_response(8)
+        elif req == "postcode":
+            # the user wants the postcode
+            self.run_system_response(10)
+        else:
+            # couldn't understand
+            self.run_system_response(13)
+
+        self.run_system_response(11)
+        self.demand_answer = True
+
+    def say_goodbye(self, user_utterance: str, dialog_act: str) -> None:
+        # the user is satisfied and we can say goodbye
+        self.run_system_response(12)
+        self.state = "exit"
 
     def extract_preferences(self, user_utterance: str) -> Tuple[Union[None,str], Union[None,str], Union[None,str], Union[None,str]]:
         """Extract the preferences of the user from their response.
@@ -338,10 +402,8 @@ class DialogManager:
         Returns:
             Tuple[Union[None,str], Union[None,str], Union[None,str], Union[None,str]]: The found response of the user for the area, cuisine, pricerange and additional requirements.
         """
-        area = find_preference(self.unique_areas, user_utterance, self.area_patterns, max_levenshtein=self.max_levenshtein)
-        cuisine = find_preference(self.unique_cuisines, user_utterance, self.cuisine_patterns, max_levenshtein=self.max_levenshtein)
-        pricerange = find_preference(self.unique_priceranges, user_utterance, self.pricerange_patterns, max_levenshtein=self.max_levenshtein)
-        additional = find_preference(self.unique_additional_requirements, user_utterance, self.implication_patterns, max_levenshtein=self.max_levenshtein)
+        with self.instrumentation.span("extract_preferences"):
+            area, cuisine, pricerange, additional = self.slot_extractor.extract(user_utterance, max_levenshtein=self.settings.current.levenshtein_distance)
         return area, cuisine, pricerange, additional
     
     def update_user_preferences(self, preferences: Tuple[Union[None,str], Union[None,str], Union[None,str], Union[None,str]]) -> None:
@@ -358,109 +420,118 @@ class DialogManager:
         if pricerange:
             self.user_preferences.pricerange = pricerange
         if additional_requirement:
-            self.user_preferences.additional_requirement = additional_requirement
+            self.add_additional_requirement(additional_requirement)
+
+    def add_additional_requirement(self, requirement: str) -> None:
+        """Add an additional requirement of the user to the ones they already have.
+        The requirements it conflicts with (like "romantic" with "assigned seats") are dropped, and the user is told so.
+
+        Args:
+            requirement (str): The additional requirement, "any" drops all requirements.
+        """
+        if requirement == "any":
+            self.user_preferences.additional_requirements = ("any",)
+            return
+        requirements = self.user_preferences.get_requirements()
+        if requirement in requirements:
+            return
+
+        # the requirement is the newest, so it wins from the requirements it conflicts with
+        dropped = [first for first, _ in self.implication_rules.get_conflicts(requirements + (requirement,))]
+        if dropped:
+            self.instrumentation.count("requirement_conflicts", requirement)
+            self.run_system_response(16, {"requirement": self.implication_rules[requirement].texts[0],
+                                            "conflict": " or ".join(self.implication_rules[name].texts[0] for name in dropped)})
+        self.user_preferences.additional_requirements = tuple(name for name in requirements if name not in dropped) + (requirement,)
 
     def filter_restaurants(self) -> None:
-        """Filters the restaurants based on the preference of the user.
+        """Ranks the restaurants based on the preference of the user, leaving out the restaurants which have already been suggested.
+        Only the preferences which changed since the previous ranking are scored again.
         """
-        options = []
-        for r in self.restaurants:
-            if (self.user_preferences.area == r.area or self.user_preferences.area == "any") and \
-                (self.user_preferences.cuisine == r.cuisine or self.user_preferences.cuisine == "any") and \
-                (self.user_preferences.pricerange == r.pricerange or self.user_preferences.pricerange == "any"):
-                # this restaurant is acceptable
-                options.append(r)
-
-        if self.user_preferences.additional_requirement and self.user_preferences.additional_requirement != "any":
-            # the user has an additional requirement, so we have to do some implication work
-            req_options = []
-            antecedents = self.implication_rules.get(self.user_preferences.additional_requirement).get("antecedents")
-
-            # loop over all remaining restaurants
-            for res in options:
-                # get all the important properties of the restaurant
-                props = res.get_restaurant_properties()
-                contains_all_antecedents = True
-
-                # check if the antecedents hold for the properties of the current restaurant
-                for antecedent in antecedents:
-                    if antecedent not in props:
-                        # an antecedent is missing so this restaurant is not suitable
-                        contains_all_antecedents = False
-                        break
-
-                if contains_all_antecedents:
-                    req_options.append(res)
-
-            options = req_options
-        
+        # the user may have additional requirements, so the restaurants should meet their combined implication rule
+        requirement = self.implication_rules.combine(self.user_preferences.get_requirements())
+
         # update the restaurants the user can choose from
-        self.remaining_restaurants = options
+        with self.instrumentation.span("filter_restaurants"):
+            self.recommendations = self.ranking.rank(
+                self.user_preferences.area, self.user_preferences.cuisine, self.user_preferences.pricerange, requirement, exclude=self.suggested_restaurants)
 
 
-    def run_system_response(self, dialog_option: int) -> None:
+    def run_system_response(self, dialog_option: int, values: Union[Dict[str, str], None] = None) -> str:
         """Selects a sentence based on the input and, whenever needed, constructs the sentences by filling in the templates.
+        The sentence is queued in the responses of the DialogManager.
 
         Args:
             dialog_option (int): The specific dialog to run in the CLI
+            values (Union[Dict[str, str], None], optional): The values of the tags which are not about the chosen restaurant. Defaults to None.
+
+        Returns:
+            str: The constructed system utterance.
         """
-        if not config('use_tts', cast=bool):
-            dialog_sentence = "System: "
-        else: 
-            dialog_sentence = ""
-        if config('formal', cast=bool):
-            # use formal language
-            dialog_sentence += random.choice(dialog_choices.get("formal").get(dialog_option))
-        else:
-            # use informal language
-            dialog_sentence += random.choice(dialog_choices.get("informal").get(dialog_option))
+        settings = self.settings.current
+
+        with self.instrumentation.span("run_system_response"):
+            with self.instrumentation.span("render_response"):
+                dialog_sentence = self.render_response(dialog_option, settings, values)
+            self.instrumentation.count("system_responses", str(dialog_option))
+
+        # return the dialog to the user
+        self.responses.append(dialog_sentence)
+        return dialog_sentence
+
+    def render_response(self, dialog_option: int, settings: Settings, values: Union[Dict[str, str], None] = None) -> str:
+        """Construct the system utterance of a dialog option by filling in its template.
+
+        Args:
+            dialog_option (int): The specific dialog to run in the CLI
+            settings (Settings): The current settings.
+            values (Union[Dict[str, str], None], optional): The values of the tags which are not about the chosen restaurant. Defaults to None.
+
+        Returns:
+            str: The constructed system utterance.
+        """
+        # pick one of the compiled templates of the dialog option
+        template = random.choice(response_templates.get("formal" if settings.formal else "informal").get(dialog_option))
 
         if self.chosen_restaurant:
-            restaurant_info = [
-                ("<name>", self.chosen_restaurant.name), ("<area>", self.chosen_restaurant.area), ("<pricerange>", self.chosen_restaurant.pricerange),
-                ("<address>", self.chosen_restaurant.address), ("<phone>", self.chosen_restaurant.phone), ("<postcode>", self.chosen_restaurant.postcode)]
-
-            # run all the replacements
-            for tag, info in restaurant_info:
-                dialog_sentence = dialog_sentence.replace(tag, info)
-            
-            if self.user_preferences.additional_requirement and self.state == "5_make_suggestion" and self.user_preferences.additional_requirement != "any":
-                # check whether we have a valid input as the additional requirement and we're in the state where we can make suggestions
-                user_req = self.user_preferences.additional_requirement
-                # get the corresponding antecedents and texts
-                antecedents = self.implication_rules.get(user_req).get("antecedents")
-                texts = self.implication_rules.get(user_req).get("texts")
-
-                # setup the reasoning text for explaining the choice (reason0 is reserved for the consequence)
-                if len(antecedents) == 1:
-                    dialog_sentence += f"\nThe restaurant is <reason0> because it <reason1>."
-                elif len(antecedents) == 2:
-                    dialog_sentence += f"\nThe restaurant is <reason0> because it <reason1> and <reason2>."
-                elif len(antecedents) == 3:
-                    dialog_sentence += f"\nThe restaurant is <reason0> because it <reason1>, <reason2> and <reason3>."
-                else:
-                    raise NotImplementedError("A maximum of three antecendents can be used for the reasoning component.")
-
-                # fill in the templates using the texts
-                for i, text in enumerate(texts):
-                    dialog_sentence = dialog_sentence.replace(f"<reason{i}>", text)
-
-        # introduce a random system delay of 0.5 seconds
-        if config('use_delay', cast=bool):
-            time.sleep(0.5)
-
-        if config('use_caps', cast=bool):
+            restaurant_info = {"name": self.chosen_restaurant.name, "area": self.chosen_restaurant.area, "pricerange": self.chosen_restaurant.pricerange,
+                "address": self.chosen_restaurant.address, "phone": self.chosen_restaurant.phone, "postcode": self.chosen_restaurant.postcode}
+            dialog_sentence = template.render({**restaurant_info, **values} if values else restaurant_info)
+
+            requirements = self.user_preferences.get_requirements()
+            if requirements and self.state == "5_make_suggestion" and dialog_option in (5, 15) and self.chosen_meets_requirement:
+                # we have valid additional requirements, which the suggested restaurant meets, and we're in the state where we can make suggestions, so explain the choice
+                dialog_sentence += self.implication_rules.combine(requirements).explanation
+        else:
+            dialog_sentence = template.render(values or {})
+
+        if not settings.use_tts:
+            dialog_sentence = "System: " + dialog_sentence
+
+        if settings.use_caps:
             dialog_sentence = dialog_sentence.upper()
 
-        # return the dialog to the user
-        print(dialog_sentence)
-
-        # use text-to-speech 
-        if config('use_tts', cast=bool):
-            engine = pyttsx3.init()
-            engine.setProperty('rate', config('tts_rate', cast=int))
-            engine.setProperty('voice', engine.getProperty('voices')[config('tts_voice', cast=int)].id)
-            engine.setProperty('volume', config('tts_volume', cast=float))
-            engine.say(dialog_sentence)
-            engine.runAndWait()
-    
\ No newline at end of file
+        return dialog_sentence
+    
+
+
+# the dialog policy: in a state, for one of the dialog acts (and when the guard holds) the action of the first matching row moves the dialog to one of its targets
+transition_table = [
+    Transition(ANY, ("bye", "thankyou"), "end_dialog", ("exit",)),
+    Transition(ANY, ANY, "restart", ("1_welcome",), guard="wants_restart"),
+    Transition("1_welcome", ("inform",), "inform_and_ask_next_preference", ("2_ask_area", "3_ask_cuisine", "4_ask_additional_prefs", "5_make_suggestion")),
+    Transition("1_welcome", ANY, "ask_next_preference", ("2_ask_area", "3_ask_cuisine", "4_ask_additional_prefs", "5_make_suggestion")),
+    Transition("2_ask_area", ("inform",), "inform_and_return_to_welcome", ("1_welcome",)),
+    Transition("2_ask_area", ANY, "return_to_welcome", ("1_welcome",)),
+    Transition("3_ask_cuisine", ("inform",), "inform_and_return_to_welcome", ("1_welcome",)),
+    Transition("3_ask_cuisine", ANY, "return_to_welcome", ("1_welcome",)),
+    Transition("4_ask_additional_prefs", ("inform",), "inform_and_fill_preferences", ("1_welcome",)),
+    Transition("4_ask_additional_prefs", ANY, "fill_preferences", ("1_welcome",)),
+    Transition("5_make_suggestion", ("ack", "affirm"), "offer_information", ("6_give_information",)),
+    Transition("5_make_suggestion", ("request",), "move_to_information", ("6_give_information",)),
+    Transition("5_make_suggestion", ("inform", "reqalts"), "inform_and_suggest", ("5_make_suggestion",)),
+    Transition("5_make_suggestion", ANY, "suggest", ("5_make_suggestion",)),
+    Transition("6_give_information", ("request",), "give_information", ("6_give_information",)),
+    Transition("6_give_information", ANY, "say_goodbye", ("exit",)),
+]
+dialog_policy = DialogPolicy(transition_table, DialogManager, DIALOG_ACTS, initial_state="1_welcome", final_states=("exit",))
@@ -0,0 +1,137 @@
+from collections import deque
+from typing import Callable, Dict, Iterable, List, NamedTuple, Sequence, Tuple, Union
+
+
+# matches every dialog act (in the dialog acts of a Transition) or every state (in the state of a Transition)
+ANY = "*"
+
+
+class Transition(NamedTuple):
+    """A row of the transition table of a dialog policy.
+    In the state, for one of the dialog acts and when the guard holds, the action is run, which moves the dialog to one of the targets.
+    """
+    state: str
+    dialog_acts: Union[Tuple[str, ...], str]
+    action: str
+    targets: Tuple[str, ...]
+    guard: Union[str, None] = None
+
+
+class DialogPolicy:
+    """A declarative transition table compiled into integer indexed dispatch.
+    The actions and guards are methods (by name) of the handler class, like the DialogManager, which are looked up once.
+    Every cell (state, dialog act) holds the candidate rows in the order of the table, the first row whose guard holds is taken.
+    The compiled policy holds no session state, so one instance is shared by all dialog managers.
+    """
+
+    def __init__(self, transitions: Sequence[Transition], handler: type, dialog_acts: Iterable[str], initial_state: str, final_states: Iterable[str] = ()) -> None:
+        """Compile and validate the transition table.
+
+        Args:
+            transitions (Sequence[Transition]): The rows of the transition table, earlier rows take precedence.
+            handler (type): The class defining the actions and guards.
+            dialog_acts (Iterable[str]): The known dialog acts, any other dialog act is dispatched like a row for ANY.
+            initial_state (str): The state the dialog starts in.
+            final_states (Iterable[str], optional): The states in which the dialog ends, these need no rows of their own. Defaults to ().
+
+        Raises:
+            ValueError: When the table is invalid, see validate.
+        """
+        self.transitions = list(transitions)
+        self.initial_state = initial_state
+        self.final_states = set(final_states)
+
+        # number the states (in order of appearance) and the dialog acts, the last id of both stands for any other
+        states: List[str] = []
+        for name in [initial_state] + [transition.state for transition in self.transitions] + \
+                [target for transition in self.transitions for target in transition.targets] + sorted(self.final_states):
+            if name != ANY and name not in states:
+                states.append(name)
+        self.states = states
+        self.state_ids: Dict[str, int] = {state: i for i, state in enumerate(states)}
+        self.dialog_acts = sorted(set(dialog_acts))
+        self.dialog_act_ids: Dict[str, int] = {dialog_act: i for i, dialog_act in enumerate(self.dialog_acts)}
+
+        # the table of candidate (guard, action) pairs per state and dialog act
+        self.table: List[List[Tuple[Tuple[Union[Callable, None], Callable], ...]]] = []
+        for state_id in range(len(self.states) + 1):
+            row = []
+            for dialog_act_id in range(len(self.dialog_acts) + 1):
+                row.append(tuple(
+                    (getattr(handler, transition.guard) if transition.guard else None, getattr(handler, transition.action))
+                    for transition in self.transitions if self.matches(transition, state_id, dialog_act_id)))
+            self.table.append(row)
+
+        self.validate(handler)
+
+    def matches(self, transition: Transition, state_id: int, dialog_act_id: int) -> bool:
+        """Check whether a row of the table applies to a cell.
+
+        Args:
+            transition (Transition): The row.
+            state_id (int): The id of the state (len(states) for an unknown state).
+            dialog_act_id (int): The id of the dialog act (len(dialog_acts) for an unknown dialog act).
+
+        Returns:
+            bool: whether the row applies.
+        """
+        if transition.state != ANY and (state_id == len(self.states) or self.states[state_id] != transition.state):
+            return False
+        if transition.dialog_acts == ANY:
+            return True
+        return dialog_act_id < len(self.dialog_acts) and self.dialog_acts[dialog_act_id] in transition.dialog_acts
+
+    def validate(self, handler: type) -> None:
+        """Check the table: every action and guard exists, every dialog act is known, every state can be reached
+        from the initial state and every state which is not final handles every dialog act.
+
+        Args:
+            handler (type): The class defining the actions and guards.
+
+        Raises:
+            ValueError: When the table is invalid.
+        """
+        errors = []
+        for transition in self.transitions:
+            for name in (transition.action, transition.guard):
+                if name is not None and not callable(getattr(handler, name, None)):
+                    errors.append(f"{handler.__name__} has no method {name}")
+            if transition.dialog_acts != ANY:
+                errors.extend(f"unknown dialog act {dialog_act} in the transition of {transition.state}"
+                              for dialog_act in transition.dialog_acts if dialog_act not in self.dialog_act_ids)
+
+        # the states which can be reached from the initial state, following the targets of the rows
+        reachable = {self.initial_state}
+        queue = deque([self.initial_state])
+        while queue:
+            state = queue.popleft()
+            for transition in self.transitions:
+                if transition.state in (state, ANY):
+                    for target in transition.targets:
+                        if target not in reachable:
+                            reachable.add(target)
+                            queue.append(target)
+        errors.extend(f"state {state} cannot be reached from {self.initial_state}" for state in self.states if state not in reachable)
+
+        for state in self.states:
+            if state in self.final_states:
+                continue
+            # the last candidate of every cell should always apply
+            cells = self.table[self.state_ids[state]]
+            if any(not cell or cell[-1][0] is not None for cell in cells):
+                errors.append(f"state {state} does not handle every dialog act")
+
+        if errors:
+            raise ValueError("Invalid transition table: " + "; ".join(errors))
+
+    def dispatch(self, state: str, dialog_act: str) -> Tuple[Tuple[Union[Callable, None], Callable], ...]:
+        """Look up the candidate rows for a state and a dialog act.
+
+        Args:
+            state (str): The current state.
+            dialog_act (str): The predicted dialog act.
+
+        Returns:
+            Tuple[Tuple[Union[Callable, None], Callable], ...]: The (guard, action) pairs in order of precedence.
+        """
+        return self.table[self.state_ids.get(state, len(self.states))][self.dialog_act_ids.get(dialog_act, len(self.dialog_acts))]
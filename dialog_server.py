@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import secrets
+import socket
+import time
+
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Deque, List, Tuple, Union
+
+from restaurant_catalog import RestaurantCatalog
+from restaurant_snapshot import load_catalog
+from dialog_management import RESPONSE_DELAY, DialogManager
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from intent_classification import CachedIntentClassifier, IntentClassifier, NaiveBayesPredictor
+from model_store import load_or_train
+from settings import SettingsManager
+
+
+class SessionLimitReached(Exception):
+    """Raised when a new session is requested while the engine is serving the maximum number of sessions.
+    """
+
+
+class DialogSession:
+    """A single conversation, holding the dialog state and a bounded transcript.
+    """
+    __slots__ = ("session_id", "dialog_manager", "transcript", "last_active")
+
+    def __init__(self, session_id: str, dialog_manager: DialogManager, max_history: int) -> None:
+        """Initialize the session.
+
+        Args:
+            session_id (str): The unique id of the session.
+            dialog_manager (DialogManager): The DialogManager holding the state of this conversation.
+            max_history (int): The maximum number of utterances kept in the transcript.
+        """
+        self.session_id = session_id
+        self.dialog_manager = dialog_manager
+        self.transcript: Deque[Tuple[str, str]] = deque(maxlen=max_history)
+        self.last_active = time.monotonic()
+
+    def is_finished(self) -> bool:
+        """Check whether the conversation has ended.
+
+        Returns:
+            bool: whether the dialog reached the exit state.
+        """
+        return self.dialog_manager.get_current_state() == "exit"
+
+
+class DialogEngine:
+    """Runs many independent conversations on one shared intent model and restaurant table.
+    The engine does no input or output, every turn returns the system utterances as values.
+    """
+
+    def __init__(self, intent_model: IntentClassifier, restaurants: RestaurantCatalog, settings: SettingsManager = None, session_ttl: float = 900.0,
+                    max_sessions: int = 10000, max_utterance_length: int = 500, max_history: int = 20, max_steps_per_turn: int = 10,
+                    instrumentation: Instrumentation = NULL_INSTRUMENTATION) -> None:
+        """Initialize the engine.
+
+        Args:
+            intent_model (IntentClassifier): The trained intent classifier shared by all sessions.
+            restaurants (RestaurantCatalog): The catalog of restaurants shared by all sessions.
+            settings (SettingsManager, optional): The holder of the settings shared by all sessions, loaded from the .env file when None. Defaults to None.
+            session_ttl (float, optional): The number of seconds a session may stay idle before it expires. Defaults to 900.0.
+            max_sessions (int, optional): The maximum number of concurrent sessions. Defaults to 10000.
+            max_utterance_length (int, optional): User utterances are truncated to this many characters. Defaults to 500.
+            max_history (int, optional): The maximum number of utterances kept in the transcript of a session. Defaults to 20.
+            max_steps_per_turn (int, optional): The maximum number of state transitions for a single user utterance. Defaults to 10.
+            instrumentation (Instrumentation, optional): Where the timings and counters of all sessions are recorded. Defaults to NULL_INSTRUMENTATION (disabled).
+        """
+        self.intent_model = intent_model
+        self.restaurants = restaurants
+        self.settings = settings if settings is not None else SettingsManager()
+        self.instrumentation = instrumentation
+        # the index, the recommender, the implication rules and the extractors are built once and shared by all sessions
+        prototype = DialogManager("1_welcome", intent_model, restaurants, settings=self.settings)
+        self.restaurant_index = prototype.restaurant_index
+        self.recommender = prototype.recommender
+        self.implication_rules = prototype.implication_rules
+        self.slot_extractor = prototype.slot_extractor
+        self.request_extractor = prototype.request_extractor
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self.max_utterance_length = max_utterance_length
+        self.max_history = max_history
+        self.max_steps_per_turn = max_steps_per_turn
+        # sessions ordered from least to most recently active
+        self.sessions: "OrderedDict[str, DialogSession]" = OrderedDict()
+
+    def open_session(self) -> Tuple[str, List[str]]:
+        """Start a new conversation.
+
+        Raises:
+            SessionLimitReached: When the engine already serves the maximum number of sessions.
+
+        Returns:
+            Tuple[str, List[str]]: The id of the new session and the welcome utterances.
+        """
+        self.expire_sessions()
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitReached(f"The maximum of {self.max_sessions} sessions has been reached.")
+
+        session_id = secrets.token_hex(8)
+        dialog_manager = DialogManager("1_welcome", self.intent_model, self.restaurants, restaurant_index=self.restaurant_index, recommender=self.recommender, implication_rules=self.implication_rules, slot_extractor=self.slot_extractor,
+                                        request_extractor=self.request_extractor, settings=self.settings, instrumentation=self.instrumentation)
+        session = DialogSession(session_id, dialog_manager, self.max_history)
+        self.sessions[session_id] = session
+        self.instrumentation.count("sessions", "opened")
+
+        dialog_manager.run_system_response(1)
+        responses = dialog_manager.pop_responses()
+        session.transcript.extend(("system", response) for response in responses)
+        return session_id, responses
+
+    def handle(self, session_id: str, user_utterance: str) -> List[str]:
+        """Process a single user utterance within a session.
+
+        Args:
+            session_id (str): The id of the session.
+            user_utterance (str): The input from the user.
+
+        Raises:
+            KeyError: When the session does not exist (anymore).
+
+        Returns:
+            List[str]: The system utterances in response to the user.
+        """
+        session = self.sessions[session_id]
+        self.sessions.move_to_end(session_id)
+        session.last_active = time.monotonic()
+
+        user_utterance = user_utterance.strip().lower()[:self.max_utterance_length]
+        session.transcript.append(("user", user_utterance))
+
+        # keep on stepping through the states until the system demands a new answer from the user
+        dialog_manager = session.dialog_manager
+        with self.instrumentation.span("turn"):
+            responses = dialog_manager.next_state(user_utterance)
+            steps = 1
+            while not dialog_manager.demand_answer and not session.is_finished() and steps < self.max_steps_per_turn:
+                responses.extend(dialog_manager.next_state(user_utterance))
+                steps += 1
+            dialog_manager.demand_answer = True
+        self.instrumentation.count("steps_per_turn", str(steps))
+
+        session.transcript.extend(("system", response) for response in responses)
+        if session.is_finished():
+            self.close_session(session_id)
+        return responses
+
+    def close_session(self, session_id: str) -> None:
+        """End a conversation and release its state.
+
+        Args:
+            session_id (str): The id of the session.
+        """
+        if self.sessions.pop(session_id, None) is not None:
+            self.instrumentation.count("sessions", "closed")
+
+    def expire_sessions(self, now: Union[float, None] = None) -> int:
+        """Remove all sessions which have been idle for longer than the session ttl.
+
+        Args:
+            now (Union[float, None], optional): The current monotonic time. Defaults to None.
+
+        Returns:
+            int: The number of expired sessions.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        expired = 0
+        # the sessions are ordered by activity, so we can stop at the first active one
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if now - session.last_active < self.session_ttl:
+                break
+            self.close_session(session_id)
+            expired += 1
+        if expired:
+            self.instrumentation.count("sessions", "expired", expired)
+        return expired
+
+
+async def handle_connection(engine: DialogEngine, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Serve a single client using a line protocol. Every connection is one session.
+    Each line from the client is a user utterance, the system answers with its utterances followed by an empty line.
+
+    Args:
+        engine (DialogEngine): The engine running the conversations.
+        reader (asyncio.StreamReader): The stream to read the client lines from.
+        writer (asyncio.StreamWriter): The stream to write the system lines to.
+    """
+    async def send(responses: List[str]) -> None:
+        # the optional system delay is awaited, so the other sessions are served in the meantime
+        if engine.settings.current.use_delay:
+            await asyncio.sleep(RESPONSE_DELAY * len(responses))
+        writer.write("".join(f"{response}\n" for response in responses).encode() + b"\n")
+        await writer.drain()
+
+    session_id = None
+    try:
+        try:
+            session_id, responses = engine.open_session()
+        except SessionLimitReached:
+            await send(["System: The system is too busy right now, please try again later."])
+            return
+        await send(responses)
+
+        while session_id in engine.sessions:
+            try:
+                line = await asyncio.wait_for(reader.readline(), timeout=engine.session_ttl)
+            except asyncio.TimeoutError:
+                # the session expired while waiting for the user
+                break
+            except ValueError:
+                # the line exceeded the buffer limit of the stream
+                break
+            if not line:
+                # the client closed the connection
+                break
+
+            await send(engine.handle(session_id, line.decode(errors="replace")))
+    except ConnectionError:
+        pass
+    finally:
+        if session_id is not None:
+            engine.close_session(session_id)
+        writer.close()
+
+
+async def expire_periodically(engine: DialogEngine, interval: float) -> None:
+    """Expire the idle sessions of the engine every interval.
+
+    Args:
+        engine (DialogEngine): The engine running the conversations.
+        interval (float): The number of seconds between two expiry rounds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        engine.expire_sessions()
+
+
+async def write_metrics_periodically(engine: DialogEngine, metrics_path: Path, interval: float) -> None:
+    """Write the instrumentation of the engine to a JSON file every interval.
+
+    Args:
+        engine (DialogEngine): The engine running the conversations.
+        metrics_path (Path): The file to (over)write.
+        interval (float): The number of seconds between two writes.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        metrics_path.write_text(engine.instrumentation.to_json())
+
+
+async def serve(engine: DialogEngine, host: str = "127.0.0.1", port: int = 8765, max_line_length: int = 4096, sock: Union[socket.socket, None] = None,
+                    metrics_path: Union[Path, None] = None, metrics_interval: float = 60.0) -> None:
+    """Run the line protocol server until it is cancelled.
+
+    Args:
+        engine (DialogEngine): The engine running the conversations.
+        host (str, optional): The host to listen on. Defaults to "127.0.0.1".
+        port (int, optional): The port to listen on. Defaults to 8765.
+        max_line_length (int, optional): The maximum number of bytes in a single client line. Defaults to 4096.
+        sock (Union[socket.socket, None], optional): An already listening socket to accept from instead of the host and port. Defaults to None.
+        metrics_path (Union[Path, None], optional): The JSON file the instrumentation is written to, None does not write it. Defaults to None.
+        metrics_interval (float, optional): The number of seconds between two writes of the metrics. Defaults to 60.0.
+    """
+    connect = lambda reader, writer: handle_connection(engine, reader, writer)
+    if sock is not None:
+        server = await asyncio.start_server(connect, sock=sock, limit=max_line_length)
+    else:
+        server = await asyncio.start_server(connect, host, port, limit=max_line_length)
+    tasks = [asyncio.ensure_future(expire_periodically(engine, interval=min(60.0, engine.session_ttl)))]
+    if metrics_path is not None:
+        tasks.append(asyncio.ensure_future(write_metrics_periodically(engine, metrics_path, metrics_interval)))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if metrics_path is not None:
+            metrics_path.write_text(engine.instrumentation.to_json())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve many concurrent conversations over a line protocol.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--session-ttl", type=float, default=900.0, help="seconds a session may stay idle")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--watch-settings", action="store_true", help="reload the settings whenever the .env file changes")
+    parser.add_argument("--metrics-path", type=Path, default=None, help="JSON file to write the timings and counters to, disabled by default")
+    parser.add_argument("--metrics-interval", type=float, default=60.0, help="seconds between two writes of the metrics")
+    args = parser.parse_args()
+
+    # the settings are reloaded on SIGHUP, and optionally whenever the .env file changes
+    settings = SettingsManager(Path(".env"))
+    settings.install_reload_signal()
+    if args.watch_settings:
+        settings.watch()
+
+    # load the shared intent model (with a shared prediction cache) and restaurants once for all sessions
+    intent_model = CachedIntentClassifier(load_or_train(NaiveBayesPredictor(), Path("./data/dialog_acts.dat"), Path("./models")))
+    restaurants = load_catalog(Path("./data/restaurant_info.csv"), Path("./models/restaurant_info.catalog"))
+
+    instrumentation = Instrumentation() if args.metrics_path is not None else NULL_INSTRUMENTATION
+    engine = DialogEngine(intent_model, restaurants, settings=settings, session_ttl=args.session_ttl, max_sessions=args.max_sessions, instrumentation=instrumentation)
+    print(f"Serving the dialog system on {args.host}:{args.port}")
+    try:
+        asyncio.run(serve(engine, args.host, args.port, metrics_path=args.metrics_path, metrics_interval=args.metrics_interval))
+    except KeyboardInterrupt:
+        pass
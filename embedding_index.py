@@ -0,0 +1,184 @@
+import numpy as np
+
+from typing import List, Sequence, Tuple
+
+
+class EmbeddingIndex:
+    """A nearest neighbour index over sentence embeddings, searched by cosine similarity.
+    The embeddings are normalized once and stored as one contiguous float32 matrix (or as int8 codes with a scale per row when quantized).
+    With n_lists > 0 the embeddings are partitioned by k-means into inverted lists and only the n_probe closest lists are searched,
+    which keeps the search time flat as the corpus grows.
+    """
+
+    def __init__(self, vectors: np.ndarray, labels: Sequence[str], quantize: bool = False, n_lists: int = 0, n_probe: int = 8, seed: int = 42) -> None:
+        """Build the index.
+
+        Args:
+            vectors (np.ndarray): The embeddings, one row per sentence.
+            labels (Sequence[str]): The label of every sentence.
+            quantize (bool, optional): Whether to store the embeddings as int8 codes. Defaults to False.
+            n_lists (int, optional): The number of inverted lists, 0 searches all embeddings. Defaults to 0.
+            n_probe (int, optional): The number of inverted lists to search per query. Defaults to 8.
+            seed (int, optional): The value of the random seed for the k-means. Defaults to 42.
+        """
+        self.classes, label_ids = np.unique(np.asarray(labels), return_inverse=True)
+        matrix = self.normalize(vectors)
+        self.n_probe = n_probe
+
+        # partition the embeddings into inverted lists, the rows of a list are stored next to each other
+        self.centroids = None
+        self.list_offsets = None
+        if n_lists > 0:
+            self.centroids = self.fit_centroids(matrix, min(n_lists, len(matrix)), seed)
+            assignment = self.assign(matrix, self.centroids)
+            order = np.argsort(assignment, kind="stable")
+            matrix, label_ids = matrix[order], label_ids[order]
+            self.list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(self.centroids)))])
+
+        self.label_ids = np.ascontiguousarray(label_ids, dtype=np.int32)
+        if quantize:
+            # symmetric int8 codes with one scale per row
+            self.scales = np.maximum(np.abs(matrix).max(axis=1), 1e-12).astype(np.float32) / 127
+            self.matrix = np.ascontiguousarray(np.round(matrix / self.scales[:, None]), dtype=np.int8)
+        else:
+            self.scales = None
+            self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.label_ids)
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        """Scale the vectors to unit length, so the dot product is the cosine similarity.
+
+        Args:
+            vectors (np.ndarray): The vectors, one per row.
+
+        Returns:
+            np.ndarray: The normalized float32 vectors (all zero vectors stay zero).
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    @staticmethod
+    def assign(matrix: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Assign every vector to the most similar centroid.
+
+        Args:
+            matrix (np.ndarray): The normalized vectors.
+            centroids (np.ndarray): The normalized centroids.
+            chunk_size (int, optional): The number of vectors assigned at once. Defaults to 65536.
+
+        Returns:
+            np.ndarray: The centroid of every vector.
+        """
+        return np.concatenate([np.argmax(matrix[i:i + chunk_size] @ centroids.T, axis=1) for i in range(0, len(matrix), chunk_size)])
+
+    def fit_centroids(self, matrix: np.ndarray, n_lists: int, seed: int, iterations: int = 10, sample_size: int = 100000) -> np.ndarray:
+        """Find the centroids of the inverted lists with spherical k-means on a sample of the vectors.
+
+        Args:
+            matrix (np.ndarray): The normalized vectors.
+            n_lists (int): The number of centroids.
+            seed (int): The value of the random seed.
+            iterations (int, optional): The number of k-means iterations. Defaults to 10.
+            sample_size (int, optional): The maximum number of vectors used for the k-means. Defaults to 100000.
+
+        Returns:
+            np.ndarray: The normalized centroids.
+        """
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(len(matrix), size=min(sample_size, len(matrix)), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = self.assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            # keep the old centroid for the lists which lost all their vectors
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            sums[empty] = centroids[empty]
+            centroids = self.normalize(sums)
+        return centroids
+
+    def score(self, queries: np.ndarray, start: int = 0, stop: int = None) -> np.ndarray:
+        """Compute the cosine similarities between the queries and a range of the stored embeddings.
+
+        Args:
+            queries (np.ndarray): The normalized queries.
+            start (int, optional): The first row of the range. Defaults to 0.
+            stop (int, optional): The end of the range. Defaults to None.
+
+        Returns:
+            np.ndarray: The similarities, one row per query.
+        """
+        rows = self.matrix[start:stop]
+        if self.scales is None:
+            return queries @ rows.T
+
+        # dequantize block by block, so no float copy of the whole matrix is made
+        scales = self.scales[start:stop]
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        for i in range(0, len(rows), 65536):
+            scores[:, i:i + 65536] = (queries @ rows[i:i + 65536].T.astype(np.float32)) * scales[i:i + 65536]
+        return scores
+
+    def search(self, queries: np.ndarray, k: int, chunk_size: int = 256) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the k most similar embeddings for a batch of queries.
+
+        Args:
+            queries (np.ndarray): The query embeddings, one row per query.
+            k (int): The number of neighbours.
+            chunk_size (int, optional): The number of queries scored at once against all embeddings, bounding the memory use. Defaults to 256.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: The similarities and the rows of the neighbours per query, most similar first.
+        """
+        queries = self.normalize(np.atleast_2d(queries))
+        k = min(k, len(self))
+
+        if self.centroids is None:
+            all_scores, all_rows = [], []
+            for i in range(0, len(queries), chunk_size):
+                scores = self.score(queries[i:i + chunk_size])
+                rows = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                all_scores.append(np.take_along_axis(scores, rows, axis=1))
+                all_rows.append(rows)
+            scores, rows = np.concatenate(all_scores), np.concatenate(all_rows)
+        else:
+            scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+            rows = np.zeros((len(queries), k), dtype=np.int64)
+            probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.n_probe]
+            for i, query in enumerate(queries):
+                # gather the candidates of the closest lists
+                ranges = [(self.list_offsets[probe], self.list_offsets[probe + 1]) for probe in probes[i]]
+                candidates = np.concatenate([np.arange(start, stop) for start, stop in ranges])
+                candidate_scores = np.concatenate([self.score(query[None, :], start, stop)[0] for start, stop in ranges])
+                n = min(k, len(candidates))
+                if n == 0:
+                    continue
+                best = np.argpartition(-candidate_scores, n - 1)[:n]
+                scores[i, :n], rows[i, :n] = candidate_scores[best], candidates[best]
+
+        # sort the neighbours from most to least similar
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+
+    def predict(self, queries: np.ndarray, k: int) -> List[str]:
+        """Predict the label of every query by a majority vote of its k nearest neighbours.
+        Like sklearn, ties are broken in favour of the (alphabetically) first label.
+
+        Args:
+            queries (np.ndarray): The query embeddings, one row per query.
+            k (int): The number of neighbours.
+
+        Returns:
+            List[str]: The predicted labels.
+        """
+        scores, rows = self.search(queries, k)
+        n_classes = len(self.classes)
+        predictions = []
+        for query_scores, query_rows in zip(scores, rows):
+            votes = np.bincount(self.label_ids[query_rows[np.isfinite(query_scores)]], minlength=n_classes)
+            predictions.append(self.classes[np.argmax(votes)])
+        return predictions
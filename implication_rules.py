@@ -0,0 +1,223 @@
+import json
+import numpy as np
+
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple, Union
+
+from response_templates import compile_explanations
+from restaurant_index import RestaurantIndex
+
+
+class ImplicationRule:
+    """An implication rule compiled over the restaurant index: an additional requirement (the consequent) which holds
+    for the restaurants having all properties of its antecedents.
+    """
+    __slots__ = ("name", "antecedents", "properties", "texts", "explanation", "bits", "property_bits", "conflicts")
+
+    def __init__(self, name: str, antecedents: Tuple[str, ...], properties: Tuple[str, ...], texts: List[str], explanation: str,
+                    bits: np.ndarray, property_bits: Tuple[np.ndarray, ...]) -> None:
+        """Initialize the compiled rule.
+
+        Args:
+            name (str): The additional requirement, like "romantic".
+            antecedents (Tuple[str, ...]): The antecedents as written, properties of the restaurants or other requirements.
+            properties (Tuple[str, ...]): The restaurant properties the antecedents come down to, after following the chained rules.
+            texts (List[str]): The texts of the explanation, the consequence followed by one text per antecedent.
+            explanation (str): The sentence explaining the choice of a restaurant, starting on a new line.
+            bits (np.ndarray): The bitset of the restaurants for which the rule holds.
+            property_bits (Tuple[np.ndarray, ...]): The bitset per property.
+        """
+        self.name = name
+        self.antecedents = antecedents
+        self.properties = properties
+        self.texts = texts
+        self.explanation = explanation
+        self.bits = bits
+        self.property_bits = property_bits
+        # the requirements which cannot hold together with this one
+        self.conflicts: Set[str] = set()
+
+    def __repr__(self) -> str:
+        return f"ImplicationRule(name='{self.name}', properties={self.properties})"
+
+
+class ImplicationRules:
+    """The implication rules for the additional requirements, compiled once at startup into bitsets over the restaurants.
+    An antecedent is either a property of the restaurants (like "cheap" or "busy") or the name of another rule, which is
+    replaced by the properties of that rule (chaining). Two rules conflict when they are declared to conflict or when they
+    need different values of the same attribute, like "romantic" (quiet) and "assigned seats" (busy).
+    Requirements which do not conflict can be combined into a single compiled rule, which holds for the restaurants meeting all of them.
+    The compiled rules hold no session state, so one instance is shared by all dialog managers.
+    """
+
+    def __init__(self, rules: Dict[str, Dict[str, List[str]]], restaurant_index: RestaurantIndex) -> None:
+        """Compile the rules.
+
+        Args:
+            rules (Dict[str, Dict[str, List[str]]]): The antecedents, texts and (optionally) conflicts per additional requirement.
+            restaurant_index (RestaurantIndex): The index over the restaurants.
+
+        Raises:
+            ValueError: When an antecedent is unknown, the texts do not match the antecedents, the rules are chained in a cycle or a rule conflicts with itself.
+        """
+        self.restaurant_index = restaurant_index
+        self.names = list(rules)
+        # the attribute of every property the rules can use
+        self.property_fields = {value: field for field in restaurant_index.property_fields for value in restaurant_index.postings[field]}
+
+        for name, rule in rules.items():
+            if len(rule.get("texts")) != len(rule.get("antecedents")) + 1:
+                raise ValueError(f"The implication rule {name} needs a text for its consequence and one for every antecedent")
+        explanations = compile_explanations(rules)
+        self.rules: Dict[str, ImplicationRule] = {}
+        for name, rule in rules.items():
+            properties = self.expand(name, rules, ())
+            property_bits = tuple(restaurant_index.get_property_bits(prop) for prop in properties)
+            bits = restaurant_index.all_bits
+            for prop_bits in property_bits:
+                bits = bits & prop_bits
+            self.rules[name] = ImplicationRule(name, tuple(rule.get("antecedents")), properties, rule.get("texts"), explanations[name], bits, property_bits)
+            if self.get_conflicting_properties(properties):
+                raise ValueError(f"The implication rule {name} conflicts with itself: {self.get_conflicting_properties(properties)}")
+
+        # the conflicts are symmetric
+        for name, rule in rules.items():
+            for other in rule.get("conflicts", []):
+                if other not in self.rules:
+                    raise ValueError(f"The implication rule {name} conflicts with the unknown rule {other}")
+                self.rules[name].conflicts.add(other)
+                self.rules[other].conflicts.add(name)
+        for first, second in combinations(self.rules.values(), 2):
+            if self.get_conflicting_properties(first.properties + second.properties):
+                first.conflicts.add(second.name)
+                second.conflicts.add(first.name)
+
+        # the combined rules per requirements, compiled on demand
+        self.combined: Dict[Tuple[str, ...], ImplicationRule] = {}
+
+    @classmethod
+    def from_json(cls, file_path: Union[str, Path], restaurant_index: RestaurantIndex) -> "ImplicationRules":
+        """Load and compile the rules from a JSON file.
+
+        Args:
+            file_path (Union[str, Path]): The path to the rules.
+            restaurant_index (RestaurantIndex): The index over the restaurants.
+
+        Returns:
+            ImplicationRules: The compiled rules.
+        """
+        with open(file_path) as f:
+            return cls(json.load(f), restaurant_index)
+
+    def expand(self, name: str, rules: Dict[str, Dict[str, List[str]]], chain: Tuple[str, ...]) -> Tuple[str, ...]:
+        """Follow the chained rules down to the restaurant properties.
+
+        Args:
+            name (str): The name of the rule.
+            rules (Dict[str, Dict[str, List[str]]]): All rules.
+            chain (Tuple[str, ...]): The rules which led to this one.
+
+        Raises:
+            ValueError: When an antecedent is neither a property nor a rule or when the rules are chained in a cycle.
+
+        Returns:
+            Tuple[str, ...]: The properties, without duplicates and in the order of the antecedents.
+        """
+        if name in chain:
+            raise ValueError(f"The implication rules are chained in a cycle: {' -> '.join(chain + (name,))}")
+        properties: List[str] = []
+        for antecedent in rules[name].get("antecedents"):
+            if antecedent in rules:
+                expanded = self.expand(antecedent, rules, chain + (name,))
+            elif antecedent in self.property_fields:
+                expanded = (antecedent,)
+            else:
+                raise ValueError(f"The antecedent {antecedent} of the implication rule {name} is not a property of any restaurant")
+            properties.extend(prop for prop in expanded if prop not in properties)
+        return tuple(properties)
+
+    def get_conflicting_properties(self, properties: Iterable[str]) -> List[Tuple[str, str]]:
+        """Find the properties which cannot hold together, as they are different values of the same attribute.
+
+        Args:
+            properties (Iterable[str]): The properties.
+
+        Returns:
+            List[Tuple[str, str]]: The conflicting pairs of properties.
+        """
+        values: Dict[str, str] = {}
+        conflicts = []
+        for prop in properties:
+            field = self.property_fields[prop]
+            if values.setdefault(field, prop) != prop:
+                conflicts.append((values[field], prop))
+        return conflicts
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.rules
+
+    def __getitem__(self, name: str) -> ImplicationRule:
+        return self.rules[name]
+
+    def get(self, name: Union[str, None]) -> Union[ImplicationRule, None]:
+        return self.rules.get(name)
+
+    def get_conflicts(self, names: Iterable[str]) -> List[Tuple[str, str]]:
+        """Find the requirements which cannot be combined.
+
+        Args:
+            names (Iterable[str]): The additional requirements.
+
+        Returns:
+            List[Tuple[str, str]]: The conflicting pairs of requirements.
+        """
+        return [(first, second) for first, second in combinations(names, 2) if second in self.rules[first].conflicts]
+
+    def get_bits(self, names: Iterable[str]) -> np.ndarray:
+        """Get the bitset of the restaurants meeting all requirements.
+
+        Args:
+            names (Iterable[str]): The additional requirements.
+
+        Raises:
+            ValueError: When the requirements conflict.
+
+        Returns:
+            np.ndarray: The bitset of the restaurants.
+        """
+        names = list(names)
+        conflicts = self.get_conflicts(names)
+        if conflicts:
+            raise ValueError(f"The requirements cannot be combined: {', '.join(f'{first} and {second}' for first, second in conflicts)}")
+        bits = self.restaurant_index.all_bits
+        for name in names:
+            bits = bits & self.rules[name].bits
+        return bits
+
+    def combine(self, names: Iterable[str]) -> Union[ImplicationRule, None]:
+        """Get the compiled rule of several additional requirements together, it holds for the restaurants meeting all of them.
+
+        Args:
+            names (Iterable[str]): The additional requirements.
+
+        Raises:
+            ValueError: When the requirements conflict.
+
+        Returns:
+            Union[ImplicationRule, None]: The combined rule (the rule itself for a single requirement), None without requirements.
+        """
+        names = tuple(names)
+        if len(names) <= 1:
+            return self.rules[names[0]] if names else None
+
+        combined = self.combined.get(names)
+        if combined is None:
+            bits = self.get_bits(names)
+            rules = [self.rules[name] for name in names]
+            properties = tuple(dict.fromkeys(prop for rule in rules for prop in rule.properties))
+            combined = ImplicationRule(" and ".join(names), sum((rule.antecedents for rule in rules), ()), properties, [text for rule in rules for text in rule.texts],
+                                        "".join(rule.explanation for rule in rules), bits, tuple(self.restaurant_index.get_property_bits(prop) for prop in properties))
+            combined.conflicts = set().union(*(rule.conflicts for rule in rules))
+            self.combined[names] = combined
+        return combined
@@ -0,0 +1,204 @@
+import json
+import threading
+import time
+
+from typing import Dict, List, Tuple
+
+
+class Histogram:
+    """A histogram of durations (or other positive values) with fixed, exponentially growing buckets.
+    The buckets double from 1 microsecond up to about 17 seconds, so recording a value takes constant time and memory.
+    """
+    # the upper bounds of the buckets, the last bucket holds everything above
+    bounds = [1e-6 * 2 ** i for i in range(25)]
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a value.
+
+        Args:
+            value (float): The value, like a duration in seconds.
+        """
+        # the bucket follows from the exponent of the value, without searching the bounds
+        bucket = 0 if value <= self.bounds[0] else min(int(value / self.bounds[0] - 1e-9).bit_length(), len(self.bounds))
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def get_percentile(self, percentile: float) -> float:
+        """Estimate a percentile as the upper bound of the bucket holding it.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+
+        Returns:
+            float: The estimated percentile (capped at the maximum value).
+        """
+        if self.count == 0:
+            return 0.0
+        rank = percentile / 100 * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.get_percentile(50),
+            "p90": self.get_percentile(90),
+            "p99": self.get_percentile(99),
+            "buckets": [[bound, count] for bound, count in zip(self.bounds + [float("inf")], self.counts) if count],
+        }
+
+
+class Span:
+    """Times the block of a with statement into the histogram of its name.
+    """
+    __slots__ = ("instrumentation", "name", "start")
+
+    def __init__(self, instrumentation: "Instrumentation", name: str) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.instrumentation.observe(self.name, time.perf_counter() - self.start)
+
+
+class Instrumentation:
+    """Collects the timing spans, counters and histograms of the dialog system.
+    One instance can be shared by many dialog managers (and threads), the results are exported as plain text or JSON.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        # the counters per name and label, like the dialog acts or the state transitions
+        self.counters: Dict[Tuple[str, str], int] = {}
+        self.started_at = time.time()
+
+    def span(self, name: str) -> Span:
+        """Time a block of code, like `with instrumentation.span("predict_intent"): ...`.
+
+        Args:
+            name (str): The name of the span, the durations are recorded in the histogram with this name.
+
+        Returns:
+            Span: The context manager doing the timing.
+        """
+        return Span(self, name)
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a value in a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            value (float): The value.
+        """
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def count(self, name: str, label: str = "", amount: int = 1) -> None:
+        """Increment a counter.
+
+        Args:
+            name (str): The name of the counter.
+            label (str, optional): The label within the counter, like the dialog act. Defaults to "".
+            amount (int, optional): The increment. Defaults to 1.
+        """
+        with self.lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + amount
+
+    def reset(self) -> None:
+        """Forget everything which has been recorded.
+        """
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def to_dict(self) -> Dict:
+        """Get everything which has been recorded.
+
+        Returns:
+            Dict: The counters per name and label and the summary of every histogram.
+        """
+        with self.lock:
+            counters: Dict[str, Dict[str, int]] = {}
+            for (name, label), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[label] = value
+            histograms = {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())}
+        return {"started_at": self.started_at, "counters": counters, "histograms": histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_text(self) -> str:
+        """Format everything which has been recorded as a plain text report, the durations in milliseconds.
+
+        Returns:
+            str: The report.
+        """
+        report = self.to_dict()
+        lines: List[str] = [f"{'span':<32}{'count':>8}{'mean_ms':>10}{'p50_ms':>10}{'p90_ms':>10}{'p99_ms':>10}{'max_ms':>10}"]
+        for name, histogram in report["histograms"].items():
+            mean = histogram["sum"] / histogram["count"] if histogram["count"] else 0.0
+            lines.append(f"{name:<32}{histogram['count']:>8}" + "".join(
+                f"{value * 1000:>10.3f}" for value in (mean, histogram["p50"], histogram["p90"], histogram["p99"], histogram["max"])))
+        for name, counter in report["counters"].items():
+            lines.append("")
+            lines.append(name)
+            for label, value in sorted(counter.items(), key=lambda item: item[1], reverse=True):
+                lines.append(f"    {label:<40}{value:>8}")
+        return "\n".join(lines)
+
+
+class NullSpan:
+    """A span which does nothing, shared by all disabled spans.
+    """
+    __slots__ = ()
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class NullInstrumentation(Instrumentation):
+    """The instrumentation used when it is disabled, every call returns immediately without recording anything.
+    """
+    null_span = NullSpan()
+
+    def span(self, name: str) -> NullSpan:
+        return self.null_span
+
+    def observe(self, name: str, value: float) -> None:
+        pass
+
+    def count(self, name: str, label: str = "", amount: int = 1) -> None:
+        pass
+
+
+# the shared instance for everything which is not instrumented
+NULL_INSTRUMENTATION = NullInstrumentation()
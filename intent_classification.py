@@ -1,23 +1,51 @@
 import json
-import pandas as pd
-import spacy
+import os
+import pickle
+import re
+import threading
+import numpy as np
 
 from abc import ABC, abstractmethod
-from operator import itemgetter
-from typing import Dict, List
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from importlib.metadata import PackageNotFoundError, version
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Tuple, Union
 from pathlib import Path
 
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.feature_extraction.text import TfidfTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.metrics import accuracy_score, precision_recall_fscore_support
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.neighbors import KNeighborsClassifier
+from embedding_index import EmbeddingIndex
+from text_matching import KeywordAutomaton
+from utils import iter_batches
+
+# sklearn, spaCy and pandas are heavy to import, so they are only imported by the code which needs them
+if TYPE_CHECKING:
+    from sklearn.pipeline import Pipeline
+
+
+# bump this whenever the layout of the stored artifacts changes
+ARTIFACT_VERSION = 3
+# the dialog acts of dialog_acts.dat
+DIALOG_ACTS = ["ack", "affirm", "bye", "confirm", "deny", "hello", "inform", "negate", "null",
+               "repeat", "reqalts", "reqmore", "request", "restart", "thankyou"]
+
+
+def get_sklearn_version() -> Union[str, None]:
+    """Get the installed version of scikit-learn, without importing it.
+
+    Returns:
+        Union[str, None]: The version or None when scikit-learn is not installed.
+    """
+    try:
+        return version("scikit-learn")
+    except PackageNotFoundError:
+        return None
 
 
 class IntentClassifier(ABC):
     """Abstract class for defining the behaviour of the Intent classifiers.
     """
+    # incremented whenever the classifier is (re)trained or restored, so caches in front of it know when to invalidate
+    version = 0
 
     @abstractmethod
     def train(self, X, y):
@@ -31,6 +59,100 @@ class IntentClassifier(ABC):
     def predict_batch(self, X) -> List[str]:
         ...
 
+    @abstractmethod
+    def get_state(self) -> Dict:
+        """Get everything the trained classifier needs to make predictions.
+        """
+        ...
+
+    @abstractmethod
+    def set_state(self, state: Dict) -> None:
+        """Restore a trained classifier from the output of get_state.
+        """
+        ...
+
+    def mark_trained(self) -> None:
+        """Register that the classifier has been (re)trained or restored, called at the end of train and set_state.
+        """
+        self.version += 1
+
+    def get_params(self) -> Dict:
+        """Get the hyperparameters of the classifier, these are part of the artifact key.
+
+        Returns:
+            Dict: The keyword arguments used to construct the classifier.
+        """
+        return {}
+
+    def get_dependencies(self) -> List[Path]:
+        """Get the data files (besides the training data) the trained classifier depends on.
+
+        Returns:
+            List[Path]: The files whose contents are part of the artifact key.
+        """
+        return []
+
+    def save(self, file_path: Path, key: str = "") -> None:
+        """Store the trained classifier as an artifact on disk.
+
+        Args:
+            file_path (Path): The path to write the artifact to.
+            key (str, optional): The key identifying the training data and hyperparameters. Defaults to "".
+        """
+        artifact = {
+            "version": ARTIFACT_VERSION,
+            "sklearn_version": get_sklearn_version(),
+            "model": type(self).__name__,
+            "key": key,
+            "params": self.get_params(),
+            "state": self.get_state(),
+        }
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file first so a crash never leaves a half written artifact behind
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load(cls, file_path: Path, key: Union[str, None] = None) -> Union["IntentClassifier", None]:
+        """Load a trained classifier from an artifact on disk.
+
+        Args:
+            file_path (Path): The path to the artifact.
+            key (Union[str, None], optional): The expected artifact key, None skips the check. Defaults to None.
+
+        Returns:
+            Union[IntentClassifier, None]: The trained classifier or None when the artifact is missing or outdated.
+        """
+        return cls.from_artifact(read_artifact(file_path), key=key)
+
+    @classmethod
+    def from_artifact(cls, artifact: Union[Dict, None], key: Union[str, None] = None) -> Union["IntentClassifier", None]:
+        """Restore a trained classifier from the contents of an artifact.
+
+        Args:
+            artifact (Union[Dict, None]): The contents of the artifact, None when it could not be read.
+            key (Union[str, None], optional): The expected artifact key, None skips the check. Defaults to None.
+
+        Returns:
+            Union[IntentClassifier, None]: The trained classifier or None when the artifact is missing or outdated.
+        """
+        if artifact is None:
+            return None
+
+        if artifact.get("version") != ARTIFACT_VERSION or \
+            artifact.get("sklearn_version") != get_sklearn_version() or \
+            artifact.get("model") != cls.__name__ or \
+            (key is not None and artifact.get("key") != key):
+            # the artifact was made by another version, another model or with other data
+            return None
+
+        model = cls(**artifact.get("params"))
+        model.set_state(artifact.get("state"))
+        return model
+
 
 class MostOccuringBaselinePredictor(IntentClassifier):
     """This classifier uses the most occuring class in the data to predict the intent.
@@ -40,6 +162,7 @@ class MostOccuringBaselinePredictor(IntentClassifier):
 
     def train(self, X, y):
         self.most_occ = get_max_occurence(y)
+        self.mark_trained()
 
     def predict(self, x) -> str:
         return most_occuring_baseline([x], max_occ=self.most_occ)[0]
@@ -47,6 +170,13 @@ class MostOccuringBaselinePredictor(IntentClassifier):
     def predict_batch(self, X) -> List[str]:
         return most_occuring_baseline(X, max_occ=self.most_occ)
 
+    def get_state(self) -> Dict:
+        return {"most_occ": self.most_occ}
+
+    def set_state(self, state: Dict) -> None:
+        self.most_occ = state.get("most_occ")
+        self.mark_trained()
+
 
 class RuleBasedBaselinePredictor(IntentClassifier):
     """This classifier uses a keyword based approach to predict the intent.
@@ -54,17 +184,169 @@ class RuleBasedBaselinePredictor(IntentClassifier):
     # class variable
     name = "Rule-based baseline"
 
+    def __init__(self, rules_path: str = "./data/manual_rules.json", n_jobs: int = 1) -> None:
+        """Initialize the classifier.
+
+        Args:
+            rules_path (str, optional): The path to the keyword rules. Defaults to "./data/manual_rules.json".
+            n_jobs (int, optional): The number of processes predict_batch uses for large batches. Defaults to 1.
+        """
+        self.rules_path = rules_path
+        self.n_jobs = n_jobs
+
     def train(self, X, y):
         self.most_occ = get_max_occurence(y)
-        # load in the keywords
-        with open('./data/manual_rules.json') as f:
+        # load in the keywords and compile them into a single matcher
+        with open(self.rules_path) as f:
             self.keyword_rules = json.load(f)
+        self.compiled_rules = CompiledKeywordRules(self.keyword_rules, default_dialog=self.most_occ)
+        self.mark_trained()
 
     def predict(self, x) -> str:
-        return rule_based_baseline([x], self.keyword_rules, default_dialog=self.most_occ)[0]
+        return self.compiled_rules.predict(x)
 
     def predict_batch(self, X) -> List[str]:
-        return rule_based_baseline(X, self.keyword_rules, default_dialog=self.most_occ)
+        return self.compiled_rules.predict_batch(X, n_jobs=self.n_jobs)
+
+    def get_params(self) -> Dict:
+        return {"rules_path": self.rules_path, "n_jobs": self.n_jobs}
+
+    def get_dependencies(self) -> List[Path]:
+        # the keyword rules are training data as well, so changing them invalidates the artifact
+        return [Path(self.rules_path)]
+
+    def get_state(self) -> Dict:
+        return {"most_occ": self.most_occ, "keyword_rules": self.keyword_rules}
+
+    def set_state(self, state: Dict) -> None:
+        self.most_occ = state.get("most_occ")
+        self.keyword_rules = state.get("keyword_rules")
+        self.compiled_rules = CompiledKeywordRules(self.keyword_rules, default_dialog=self.most_occ)
+        self.mark_trained()
+
+
+class CompiledKeywordRules:
+    """The keyword rules of the rule-based baseline compiled into a single Aho-Corasick automaton,
+    which finds the matching keywords of all dialog acts in one pass over a sentence.
+    Like rule_based_baseline always did, the longest matching keyword decides the dialog act, ties go to the keyword
+    which comes first in the rules and sentences without any keyword get the default dialog act.
+    """
+
+    def __init__(self, key_words: Dict[str, List[str]], default_dialog: str = "inform") -> None:
+        """Compile the rules.
+
+        Args:
+            key_words (Dict[str, List[str]]): The keywords per dialog act.
+            default_dialog (str, optional): The dialog act for sentences without any keyword. Defaults to "inform".
+        """
+        self.default_dialog = default_dialog
+        # the payload of a keyword is its length, its position in the rules (negated, so the first one wins a tie) and its dialog act
+        keywords = [(word, dialog_act) for dialog_act, words in key_words.items() for word in words]
+        self.automaton = KeywordAutomaton((word, (len(word), -position, dialog_act)) for position, (word, dialog_act) in enumerate(keywords))
+
+    def predict(self, x: str) -> str:
+        best = None
+        for _, payload in self.automaton.find_all(x):
+            if best is None or payload > best:
+                best = payload
+        return best[2] if best is not None else self.default_dialog
+
+    def predict_chunk(self, X: List[str]) -> List[str]:
+        return [self.predict(x) for x in X]
+
+    def predict_batch(self, X: List[str], n_jobs: int = 1, chunk_size: int = 10000) -> List[str]:
+        """Predict the dialog acts of many sentences, in parallel chunks when there are enough sentences.
+
+        Args:
+            X (List[str]): The sentences.
+            n_jobs (int, optional): The number of processes. Defaults to 1.
+            chunk_size (int, optional): The number of sentences per chunk. Defaults to 10000.
+
+        Returns:
+            List[str]: The predicted dialog acts, in the order of the sentences.
+        """
+        X = list(X)
+        if n_jobs <= 1 or len(X) < 2 * chunk_size:
+            # starting the processes would take longer than the matching itself
+            return self.predict_chunk(X)
+
+        chunks = [X[i:i + chunk_size] for i in range(0, len(X), chunk_size)]
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            return [dialog_act for chunk in executor.map(self.predict_chunk, chunks) for dialog_act in chunk]
+
+
+class CompiledNaiveBayes:
+    """The inference of a fitted CountVectorizer -> TfidfTransformer -> MultinomialNB pipeline on flat numpy arrays.
+    A single utterance is scored with a direct dot product over its known tokens, instead of going through the sparse matrices of the pipeline.
+    """
+
+    def __init__(self, pipeline: "Pipeline") -> None:
+        """Compile a fitted pipeline.
+        The compiled model only holds python and numpy objects, so it can be unpickled without importing sklearn.
+
+        Args:
+            pipeline (Pipeline): The fitted pipeline with the 'vectorizer', 'tfidf' and 'model' steps.
+        """
+        vectorizer = pipeline.named_steps["vectorizer"]
+        tfidf = pipeline.named_steps["tfidf"]
+        model = pipeline.named_steps["model"]
+
+        # the same tokenization as the (default) word analyzer of the vectorizer
+        if vectorizer.analyzer != "word" or vectorizer.ngram_range != (1, 1) or vectorizer.preprocessor is not None or \
+            vectorizer.tokenizer is not None or vectorizer.stop_words is not None or vectorizer.strip_accents is not None:
+            raise ValueError("Only a vectorizer with the default word analyzer can be compiled.")
+        self.lowercase = vectorizer.lowercase
+        self.token_pattern = re.compile(vectorizer.token_pattern)
+        self.vocabulary: Dict[str, int] = dict(vectorizer.vocabulary_)
+        # the tf-idf weighting
+        self.idf = np.asarray(tfidf.idf_, dtype=np.float64) if tfidf.use_idf else None
+        self.sublinear_tf = tfidf.sublinear_tf
+        self.norm = tfidf.norm
+        # the log probabilities of the features per class, one row per feature so the rows of a sentence can be gathered
+        self.feature_log_prob = np.ascontiguousarray(model.feature_log_prob_.T, dtype=np.float64)
+        self.class_log_prior = np.asarray(model.class_log_prior_, dtype=np.float64)
+        self.classes = model.classes_
+
+    def predict(self, x: str) -> str:
+        """Predict the intent of a single utterance.
+
+        Args:
+            x (str): The utterance.
+
+        Returns:
+            str: The predicted intent, identical to the prediction of the pipeline.
+        """
+        # count the known tokens of the utterance
+        counts: Dict[int, int] = {}
+        vocabulary = self.vocabulary
+        for token in self.token_pattern.findall(x.lower() if self.lowercase else x):
+            feature = vocabulary.get(token)
+            if feature is not None:
+                counts[feature] = counts.get(feature, 0) + 1
+
+        if not counts:
+            # an all zero feature vector leaves only the class priors
+            return self.classes[np.argmax(self.class_log_prior)]
+
+        # the features in the same (sorted) order as the sparse matrix of the vectorizer
+        features = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        order = np.argsort(features)
+        features = features[order]
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[order]
+
+        # apply the tf-idf weighting and normalization
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.idf is not None:
+            values *= self.idf[features]
+        if self.norm == "l2":
+            values /= np.sqrt(np.dot(values, values))
+        elif self.norm == "l1":
+            values /= np.abs(values).sum()
+
+        # the joint log likelihood of the multinomial naive bayes
+        scores = self.class_log_prior + values @ self.feature_log_prob[features]
+        return self.classes[np.argmax(scores)]
 
 
 class NaiveBayesPredictor(IntentClassifier):
@@ -73,42 +355,426 @@ class NaiveBayesPredictor(IntentClassifier):
     # class variable
     name = "Naive Bayes"
 
+    def __init__(self, compiled: bool = True) -> None:
+        """Initialize the classifier.
+
+        Args:
+            compiled (bool, optional): Whether single utterances are predicted with the compiled pipeline. Defaults to True.
+        """
+        self.compiled = compiled
+        # the sklearn pipeline, which is only unpickled (and sklearn imported) when it is needed
+        self.pipeline = None
+        self.pipeline_bytes = None
+        self.compiled_model = None
+
+    @property
+    def model(self) -> "Pipeline":
+        """The fitted sklearn pipeline.
+        """
+        if self.pipeline is None and self.pipeline_bytes is not None:
+            self.pipeline = pickle.loads(self.pipeline_bytes)
+        return self.pipeline
+
     def train(self, X, y) -> None:
-        self.model = Pipeline([
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+
+        self.pipeline = Pipeline([
             ('vectorizer', CountVectorizer()),
             ('tfidf', TfidfTransformer()),
             ('model', MultinomialNB()),
             ])
-        self.model.fit(X, y)
+        self.pipeline.fit(X, y)
+        self.pipeline_bytes = None
+        self.compiled_model = CompiledNaiveBayes(self.pipeline)
+        self.mark_trained()
+
+    def train_stream(self, make_stream: Callable[[], Iterable[Tuple[str, str]]], batch_size: int = 10000) -> None:
+        """Train on a stream of (dialog act, utterance) pairs which does not have to fit in memory.
+        The stream is read twice: once for the vocabulary and the document frequencies, and once to feed the
+        vectorized mini-batches to the naive bayes. The result is the same model as train gives on the whole corpus.
+
+        Args:
+            make_stream (Callable[[], Iterable[Tuple[str, str]]]): A function which starts a new pass over the stream.
+            batch_size (int, optional): The number of utterances vectorized at once. Defaults to 10000.
+        """
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
+        from sklearn.naive_bayes import MultinomialNB
+        from sklearn.pipeline import Pipeline
+
+        # first pass: the vocabulary, the document frequencies and the classes
+        analyzer = CountVectorizer().build_analyzer()
+        document_frequencies: Dict[str, int] = {}
+        n_documents = 0
+        classes = set()
+        for dialog_act, utterance in make_stream():
+            n_documents += 1
+            classes.add(dialog_act)
+            for token in set(analyzer(utterance)):
+                document_frequencies[token] = document_frequencies.get(token, 0) + 1
+
+        # the vectorizer sorts its vocabulary and uses the smoothed idf
+        vectorizer = CountVectorizer(vocabulary={token: i for i, token in enumerate(sorted(document_frequencies))})
+        vectorizer.fit([])
+        tfidf = TfidfTransformer()
+        tfidf.idf_ = np.log((1 + n_documents) / (1 + np.array([document_frequencies[token] for token in sorted(document_frequencies)]))) + 1
+
+        # second pass: feed the vectorized mini-batches to the naive bayes
+        model = MultinomialNB()
+        for X, y in iter_batches(make_stream(), batch_size=batch_size):
+            model.partial_fit(tfidf.transform(vectorizer.transform(X)), y, classes=sorted(classes))
+
+        self.pipeline = Pipeline([
+            ('vectorizer', vectorizer),
+            ('tfidf', tfidf),
+            ('model', model),
+            ])
+        self.pipeline_bytes = None
+        self.compiled_model = CompiledNaiveBayes(self.pipeline)
+        self.mark_trained()
     
     def predict(self, x):
+        if self.compiled:
+            return self.compiled_model.predict(x)
         return self.model.predict([x])[0]
     
     def predict_batch(self, X) -> List[str]:
         return self.model.predict(X)
 
+    def get_params(self) -> Dict:
+        return {"compiled": self.compiled}
+
+    def get_state(self) -> Dict:
+        # the pipeline is pickled separately, so booting from the compiled model does not import sklearn
+        pipeline_bytes = self.pipeline_bytes
+        if pipeline_bytes is None:
+            pipeline_bytes = pickle.dumps(self.pipeline, protocol=pickle.HIGHEST_PROTOCOL)
+        return {"pipeline": pipeline_bytes, "compiled_model": self.compiled_model}
+
+    def set_state(self, state: Dict) -> None:
+        self.pipeline = None
+        self.pipeline_bytes = state.get("pipeline")
+        self.compiled_model = state.get("compiled_model")
+        self.mark_trained()
+
+
+class IncrementalNaiveBayesPredictor(IntentClassifier):
+    """This classifier uses an online Naive Bayes on hashed word counts to predict the intent.
+    It learns from mini-batches, so new labelled utterances are added without retraining from scratch.
+    The hashed features have a fixed size, so the memory use does not grow with the corpus or its vocabulary.
+    """
+    # class variable
+    name = "Incremental Naive Bayes"
+    # the online model has to know all classes up front
+    dialog_acts = DIALOG_ACTS
+
+    def __init__(self, n_features: int = 2 ** 16, classes: Union[List[str], None] = None) -> None:
+        """Initialize the classifier.
+
+        Args:
+            n_features (int, optional): The number of hashed word features. Defaults to 2 ** 16.
+            classes (Union[List[str], None], optional): All dialog acts the classifier can learn, None uses the dialog acts of dialog_acts.dat. Defaults to None.
+        """
+        self.n_features = n_features
+        self.classes = sorted(classes if classes is not None else self.dialog_acts)
+        self.model = None
+        self.hashing_vectorizer = None
+        self.n_samples = 0
+        # the number of items of an unfinished train_stream which have been learned, so a checkpoint resumes after them
+        self.stream_position = 0
+
+    @property
+    def vectorizer(self):
+        """The hashing vectorizer, it has no state so it is only created (and sklearn imported) when it is needed.
+        """
+        if self.hashing_vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            # raw counts, which is what the multinomial naive bayes models
+            self.hashing_vectorizer = HashingVectorizer(n_features=self.n_features, alternate_sign=False, norm=None)
+        return self.hashing_vectorizer
+
+    def train(self, X, y) -> None:
+        # start from scratch
+        self.model = None
+        self.n_samples = 0
+        self.stream_position = 0
+        self.partial_train(X, y)
+
+    def partial_train(self, X, y) -> None:
+        """Update the classifier with a mini-batch of labelled utterances.
+
+        Args:
+            X (List[str]): The utterances.
+            y (List[str]): The dialog acts of the utterances.
+        """
+        unknown = set(y).difference(self.classes)
+        if unknown:
+            raise ValueError(f"Unknown dialog acts {sorted(unknown)}, the classifier only learns {self.classes}")
+
+        if self.model is None:
+            from sklearn.naive_bayes import MultinomialNB
+            self.model = MultinomialNB()
+        self.model.partial_fit(self.vectorizer.transform(X), y, classes=self.classes)
+        self.n_samples += len(X)
+        self.mark_trained()
+
+    def train_stream(self, stream: Iterable[Tuple[str, str]], batch_size: int = 10000, checkpoint_path: Union[Path, None] = None, checkpoint_every: int = 10) -> None:
+        """Update the classifier with a stream of (dialog act, utterance) pairs in a single pass, one mini-batch at a time.
+        Unlike train this continues from the current state, so a stream can be resumed from a checkpoint: a classifier loaded
+        from a checkpoint of an unfinished stream skips the items it already learned when it is given the same stream again.
+
+        Args:
+            stream (Iterable[Tuple[str, str]]): The dialog acts and utterances, from the start also when resuming.
+            batch_size (int, optional): The number of utterances per mini-batch. Defaults to 10000.
+            checkpoint_path (Union[Path, None], optional): Where to save the classifier during training, None disables checkpoints. Defaults to None.
+            checkpoint_every (int, optional): The number of mini-batches between two checkpoints. Defaults to 10.
+        """
+        n_batches = 0
+        for X, y in iter_batches(islice(stream, self.stream_position, None), batch_size=batch_size):
+            self.partial_train(X, y)
+            self.stream_position += len(X)
+            n_batches += 1
+            if checkpoint_path is not None and n_batches % checkpoint_every == 0:
+                self.save(checkpoint_path)
+
+        # the stream is finished, the next one starts from its first item
+        self.stream_position = 0
+        if checkpoint_path is not None:
+            self.save(checkpoint_path)
+
+    def predict(self, x):
+        return self.model.predict(self.vectorizer.transform([x]))[0]
+
+    def predict_batch(self, X) -> List[str]:
+        if len(X) == 0:
+            return []
+        return self.model.predict(self.vectorizer.transform(X))
+
+    def get_params(self) -> Dict:
+        return {"n_features": self.n_features, "classes": self.classes}
+
+    def get_state(self) -> Dict:
+        # the vectorizer has no state, it is created again from the parameters
+        return {"model": self.model, "n_samples": self.n_samples, "stream_position": self.stream_position}
+
+    def set_state(self, state: Dict) -> None:
+        self.model = state.get("model")
+        self.n_samples = state.get("n_samples", 0)
+        self.stream_position = state.get("stream_position", 0)
+        self.mark_trained()
+
 
 class KNNPredictor(IntentClassifier):
     """This classifier uses a KNN and spaCy's word vectors to predict the intent.
+    The sentence vectors are stored in an EmbeddingIndex and compared by cosine similarity.
     """
     # class variable
     name = "KNN"
+    # the spaCy components which are not needed for the sentence vectors (tok2vec produces them for the small model)
+    unused_pipes = ["tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+    def __init__(self, neighbors: int = 5, quantize: bool = False, n_lists: int = 0, n_probe: int = 8) -> None:
+        """Initialize the classifier.
+
+        Args:
+            neighbors (int, optional): The number of neighbours which vote on the intent. Defaults to 5.
+            quantize (bool, optional): Whether to store the sentence vectors as int8 codes. Defaults to False.
+            n_lists (int, optional): The number of inverted lists of the index, 0 searches all vectors. Defaults to 0.
+            n_probe (int, optional): The number of inverted lists searched per utterance. Defaults to 8.
+        """
+        self.neighbors = neighbors
+        self.quantize = quantize
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+
+    def load_nlp(self):
+        """Load the spaCy pipeline used for the word vectors, without the components which are not needed for them.
+        """
+        import spacy
+        return spacy.load("en_core_web_sm", exclude=self.unused_pipes)
+
+    def embed(self, X: List[str]) -> np.ndarray:
+        """Transform the sentences into vectors.
+
+        Args:
+            X (List[str]): The sentences.
+
+        Returns:
+            np.ndarray: The sentence vectors, one row per sentence.
+        """
+        return np.array([doc.vector for doc in self.nlp.pipe(X, batch_size=256)], dtype=np.float32)
 
     def train(self, X, y) -> None:
         # transform the sentences into vectors
-        self.nlp = spacy.load("en_core_web_sm")
-        X_train = [doc.vector for doc in self.nlp.pipe(X)]
-        # setup the model
-        self.neighbors = 5
-        self.model = KNeighborsClassifier(n_neighbors=self.neighbors)
-        # fit the model
-        self.model.fit(X_train, y)
+        self.nlp = self.load_nlp()
+        # setup and fill the index
+        self.index = EmbeddingIndex(self.embed(X), y, quantize=self.quantize, n_lists=self.n_lists, n_probe=self.n_probe)
+        self.mark_trained()
     
     def predict(self, x):
-        return self.model.predict([self.nlp(x).vector])[0]
+        return self.index.predict(self.embed([x]), self.neighbors)[0]
     
     def predict_batch(self, X) -> List[str]:
-        return self.model.predict([doc.vector for doc in self.nlp.pipe(X)])
+        if len(X) == 0:
+            return []
+        return self.index.predict(self.embed(X), self.neighbors)
+
+    def get_params(self) -> Dict:
+        return {"neighbors": self.neighbors, "quantize": self.quantize, "n_lists": self.n_lists, "n_probe": self.n_probe}
+
+    def get_state(self) -> Dict:
+        # the spaCy pipeline is not stored, it is loaded again from the installed package
+        return {"index": self.index}
+
+    def set_state(self, state: Dict) -> None:
+        self.nlp = self.load_nlp()
+        self.index = state.get("index")
+        self.mark_trained()
+
+
+class CachedIntentClassifier(IntentClassifier):
+    """A bounded LRU cache of the predictions in front of any intent classifier.
+    Utterances are normalized (lowercased, whitespace collapsed) before they are looked up and predicted.
+    The cache is safe to share between threads and clears itself when the wrapped classifier is retrained.
+    """
+
+    def __init__(self, model: IntentClassifier, max_size: int = 4096) -> None:
+        """Initialize the cache.
+
+        Args:
+            model (IntentClassifier): The (trained) intent classifier to cache the predictions of.
+            max_size (int, optional): The maximum number of cached utterances. Defaults to 4096.
+        """
+        self.model = model
+        self.name = f"{model.name} (cached)"
+        self.max_size = max_size
+        self.cache: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.model_version = model.version
+        # counters for monitoring the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(x: str) -> str:
+        """Normalize an utterance into its cache key.
+
+        Args:
+            x (str): The utterance.
+
+        Returns:
+            str: The lowercased utterance with single spaces between the words.
+        """
+        return " ".join(x.lower().split())
+
+    def train(self, X, y) -> None:
+        self.model.train(X, y)
+
+    def predict(self, x) -> str:
+        key = self.normalize(x)
+        with self.lock:
+            if self.model.version != self.model_version:
+                # the wrapped classifier has been retrained, so all cached predictions are outdated
+                self.cache.clear()
+                self.model_version = self.model.version
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key]
+            self.misses += 1
+            model_version = self.model_version
+
+        # predict outside of the lock, so other threads are not blocked by the classifier
+        prediction = self.model.predict(key)
+
+        with self.lock:
+            if model_version == self.model_version:
+                self.cache[key] = prediction
+                while len(self.cache) > self.max_size:
+                    self.cache.popitem(last=False)
+                    self.evictions += 1
+        return prediction
+
+    def predict_batch(self, X) -> List[str]:
+        return self.model.predict_batch([self.normalize(x) for x in X])
+
+    def get_state(self) -> Dict:
+        return self.model.get_state()
+
+    def set_state(self, state: Dict) -> None:
+        self.model.set_state(state)
+
+    def save(self, file_path: Path, key: str = "") -> None:
+        # the artifact of the wrapped classifier is stored, the cache itself is not persisted
+        self.model.save(file_path, key=key)
+
+    @classmethod
+    def load(cls, file_path: Path, key: Union[str, None] = None, max_size: int = 4096) -> Union["CachedIntentClassifier", None]:
+        """Load the wrapped classifier from its artifact and put a new, empty cache in front of it.
+
+        Args:
+            file_path (Path): The path to the artifact of the wrapped classifier.
+            key (Union[str, None], optional): The expected artifact key, None skips the check. Defaults to None.
+            max_size (int, optional): The maximum number of cached utterances. Defaults to 4096.
+
+        Returns:
+            Union[CachedIntentClassifier, None]: The cached classifier or None when the artifact is missing or outdated.
+        """
+        artifact = read_artifact(file_path)
+        if artifact is None:
+            return None
+        # the artifact names the class of the wrapped classifier
+        model_class = get_classifier_classes().get(artifact.get("model"))
+        if model_class is None or model_class is cls:
+            return None
+        model = model_class.from_artifact(artifact, key=key)
+        return cls(model, max_size=max_size) if model is not None else None
+
+    def get_stats(self) -> Dict:
+        """Get the counters of the cache.
+
+        Returns:
+            Dict: The hits, misses, evictions and the current size of the cache.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self.cache)}
+
+
+def read_artifact(file_path: Path) -> Union[Dict, None]:
+    """Read the contents of an artifact written by IntentClassifier.save.
+
+    Args:
+        file_path (Path): The path to the artifact.
+
+    Returns:
+        Union[Dict, None]: The contents of the artifact or None when it is missing or cannot be read.
+    """
+    if not file_path.exists():
+        return None
+
+    try:
+        with open(file_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # a corrupt or incompatible artifact is treated as a missing one
+        return None
+
+
+def get_classifier_classes() -> Dict[str, type]:
+    """Get all intent classifier classes by name.
+
+    Returns:
+        Dict[str, type]: The (indirect) subclasses of IntentClassifier per class name.
+    """
+    classes: Dict[str, type] = {}
+    stack = list(IntentClassifier.__subclasses__())
+    while stack:
+        subclass = stack.pop()
+        classes[subclass.__name__] = subclass
+        stack.extend(subclass.__subclasses__())
+    return classes
 
 
 def get_max_occurence(train: List[str]):
@@ -148,34 +814,15 @@ def rule_based_baseline(X: List[str], key_words: Dict, default_dialog: str = "in
   returns:
     List[str]: The predicted labels.
   """
-  output = []
+  # find the keywords of all dialog acts in a single pass per sentence
+  return CompiledKeywordRules(key_words, default_dialog=default_dialog).predict_batch(X)
 
-  # loop over the input sentences
-  for sentence in X:
-    
-    # 
-    possible_acts = []
-    for dialog_act, keywords in key_words.items():
-
-      # loop over all keywords connected to a dialog act
-      for word in keywords:
-        # check if the keywords exists in the sentence
-        if word in sentence:
-          # found a matching keyword, add it to the possible acts
-          possible_acts.append((len(word), dialog_act))
-  
-    # check if any keyword has been found, if not take the default_dialog option
-    if possible_acts:
-      # select the dialog act with the most similarity
-      output.append(max(possible_acts,key=itemgetter(0))[1])
-      possible_acts = []
-    else:
-      output.append(default_dialog)
-  
-  return output
 
 
 if __name__ == "__main__":
+    import pandas as pd
+    from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+
     # load in the training and test dialog data
     train_path = Path("./data/training_dialog.pkl")
     test_path = Path("./data/test_dialog.pkl")
@@ -188,7 +835,7 @@ if __name__ == "__main__":
     X_test, y_test = test_df["utterance_content"].to_list(), test_df["dialog_act"].to_list()
 
     # analyse all the models above
-    models = [MostOccuringBaselinePredictor(), RuleBasedBaselinePredictor(), NaiveBayesPredictor(), KNNPredictor()]
+    models = [MostOccuringBaselinePredictor(), RuleBasedBaselinePredictor(), NaiveBayesPredictor(), IncrementalNaiveBayesPredictor(), KNNPredictor()]
     results = []
     for model in models:
         # train the model
@@ -1,30 +1,84 @@
-from decouple import config
+import time
+
 from pathlib import Path
+from typing import List
 
-from utils import load_restaurants, load_restaurant_train_test_split
-from dialog_management import DialogManager
-from intent_classification import NaiveBayesPredictor
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from settings import Settings, SettingsManager
+from speech import Pyttsx3Backend, SpeechWorker
+from restaurant_snapshot import load_catalog
+from dialog_management import RESPONSE_DELAY, DialogManager, dialog_choices
+from intent_classification import CachedIntentClassifier, NaiveBayesPredictor
+from model_store import load_or_train
 
 
-# load in the training dialog data
+# the training dialog data and the directory with the trained model artifacts
 data_path = Path("./data/dialog_acts.dat")
-train_df, _ = load_restaurant_train_test_split(data_path)
+artifact_dir = Path("./models")
 
-# load in the restaurant options
+# load in the restaurant options, from the compiled snapshot when it is up to date
 restaurants_path = Path("./data/restaurant_info.csv")
-restaurants = load_restaurants(restaurants_path)
+restaurants = load_catalog(restaurants_path, artifact_dir / "restaurant_info.catalog")
+
+
+# the text-to-speech worker, started when it is first needed
+speech_worker = None
+# the timings and counters of the dialog, only recorded in debug mode
+instrumentation = NULL_INSTRUMENTATION
+
+
+def get_fixed_sentences(settings: Settings) -> List[str]:
+    """Get the system utterances which are not filled in, so their speech can be cached.
+
+    Args:
+        settings (Settings): The current settings.
+
+    Returns:
+        List[str]: The fixed system utterances.
+    """
+    sentences = [sentence for options in dialog_choices.get("formal" if settings.formal else "informal").values() for sentence in options if "<" not in sentence]
+    return [sentence.upper() for sentence in sentences] if settings.use_caps else sentences
+
+
+def present_responses(responses: List[str], settings: SettingsManager) -> None:
+    """Show the system utterances to the user in the CLI.
+
+    Args:
+        responses (List[str]): The system utterances.
+        settings (SettingsManager): The holder of the current settings.
+    """
+    global speech_worker
+    current = settings.current
+    for response in responses:
+        # introduce a system delay before every utterance
+        if current.use_delay:
+            with instrumentation.span("delay"):
+                time.sleep(RESPONSE_DELAY)
+        print(response)
+        # use text-to-speech, the speech plays in the background while the user can already answer
+        if current.use_tts:
+            if speech_worker is None:
+                speech_worker = SpeechWorker(Pyttsx3Backend(settings), cache_dir=Path("./tts_cache"), cache_sentences=get_fixed_sentences(current), instrumentation=instrumentation)
+            speech_worker.speak(response)
+
 
 # run the main program
 if __name__ == "__main__":
 
-    # setup the intent classifier
-    intent_model = NaiveBayesPredictor()
-    intent_model.train(train_df["utterance_content"].to_list(), train_df["dialog_act"].to_list())
+    # load the settings once, they are reloaded from the .env file on SIGHUP
+    settings = SettingsManager(Path(".env"))
+    settings.install_reload_signal()
+    if settings.current.debug:
+        instrumentation = Instrumentation()
+
+    # setup the intent classifier, only trained when there is no valid stored artifact
+    intent_model = CachedIntentClassifier(load_or_train(NaiveBayesPredictor(), data_path, artifact_dir))
 
     # setup the DialogManager
     user_answer = None
-    dialog_manager = DialogManager("1_welcome", intent_model, restaurants)
+    dialog_manager = DialogManager("1_welcome", intent_model, restaurants, settings=settings, instrumentation=instrumentation)
     dialog_manager.run_system_response(1)
+    present_responses(dialog_manager.pop_responses(), settings)
 
     # while the current state is not exit, keep on looping
     while dialog_manager.get_current_state() != "exit":
@@ -33,6 +87,13 @@ if __name__ == "__main__":
             user_answer = str(input()).lower()
 
         # process the user input and set the next state
-        dialog_manager.next_state(user_answer)
-        if config('debug', cast=bool):
+        present_responses(dialog_manager.next_state(user_answer), settings)
+        if settings.current.debug:
             print(f"state: {dialog_manager.get_current_state()}; user_prefs: {dialog_manager.user_preferences}")
+
+    # let the goodbye be spoken before exiting
+    if speech_worker is not None:
+        speech_worker.close()
+
+    if instrumentation is not NULL_INSTRUMENTATION:
+        print(instrumentation.to_text())
@@ -0,0 +1,78 @@
+import hashlib
+import json
+
+from pathlib import Path
+from typing import Dict
+
+from intent_classification import ARTIFACT_VERSION, IntentClassifier
+from utils import file_digest, load_restaurant_train_test_split
+
+
+def get_artifact_key(model: IntentClassifier, data_path: Path, split_params: Dict) -> str:
+    """Compute the key of a model artifact from the training data and the hyperparameters.
+    Whenever the data, the split or the hyperparameters change the key changes as well.
+
+    Args:
+        model (IntentClassifier): The (untrained) intent classifier.
+        data_path (Path): The path to the dialog_acts.dat file.
+        split_params (Dict): The parameters of the train/test split.
+
+    Returns:
+        str: The hexadecimal key of the artifact.
+    """
+    fingerprint = {
+        "version": ARTIFACT_VERSION,
+        "model": type(model).__name__,
+        "params": model.get_params(),
+        "data": file_digest(data_path),
+        "split": split_params,
+        "dependencies": {str(path): file_digest(path) for path in model.get_dependencies()},
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+def get_artifact_path(model: IntentClassifier, artifact_dir: Path, key: str) -> Path:
+    """Get the location of the artifact of a model.
+
+    Args:
+        model (IntentClassifier): The intent classifier.
+        artifact_dir (Path): The directory holding all artifacts.
+        key (str): The key of the artifact.
+
+    Returns:
+        Path: The path to the artifact.
+    """
+    return artifact_dir / f"{type(model).__name__}-{key[:16]}.pkl"
+
+
+def load_or_train(model: IntentClassifier, data_path: Path, artifact_dir: Path, test_size: float = 0.15, seed: int = 42) -> IntentClassifier:
+    """Load the trained model from its stored artifact, or train it and store the artifact when there is none.
+    Artifacts of the same model made with other data or hyperparameters are removed.
+
+    Args:
+        model (IntentClassifier): The (untrained) intent classifier.
+        data_path (Path): The path to the dialog_acts.dat file.
+        artifact_dir (Path): The directory holding all artifacts.
+        test_size (float, optional): The size of the test dataset. Defaults to 0.15.
+        seed (int, optional): The value of the random seed. Defaults to 42.
+
+    Returns:
+        IntentClassifier: The trained intent classifier.
+    """
+    key = get_artifact_key(model, data_path, {"test_size": test_size, "seed": seed})
+    artifact_path = get_artifact_path(model, artifact_dir, key)
+
+    # boot from the stored artifact when it is still valid
+    stored_model = type(model).load(artifact_path, key=key)
+    if stored_model is not None:
+        return stored_model
+
+    # no (valid) artifact, so train the model from scratch
+    train_df, _ = load_restaurant_train_test_split(data_path, test_size=test_size, seed=seed)
+    model.train(train_df["utterance_content"].to_list(), train_df["dialog_act"].to_list())
+
+    # invalidate the outdated artifacts of this model and store the new one
+    for outdated_path in artifact_dir.glob(f"{type(model).__name__}-*.pkl"):
+        outdated_path.unlink()
+    model.save(artifact_path, key=key)
+    return model
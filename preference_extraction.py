@@ -1,50 +1,157 @@
-from tkinter.tix import Tree
+import math
 import Levenshtein
-import numpy as np
 
-from typing import List, Union
+from typing import Dict, List, Tuple, Union
 
+from text_matching import FuzzyIndex, KeywordAutomaton
 
-def find_preference(options: List[str], user_utterance: str, patterns: List[str] = [], max_levenshtein: int = 0) -> Union[str, None]:
-    """Finds the preference in a sentence out of a list with options and the levenshtein distance.
 
-    Args:
-        options (List[str]): a list of options for which we search in the text.
-        user_utterance (str): The input from the user.
-        patterns (List[str], optional): a list of the pattern options to potentially match, optional in case of not area, cuisine or pricerange.
-        max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
-
-    Returns:
-        Union[str, None]: returns either the best found match or None.
+class SlotExtractor:
+    """Finds the preferences for several slots in a sentence at once.
+    Follows the matching of the original find_preference for every slot (kept in benchmarks/slot_extraction.py, which compares
+    the two): an exact match first, then the 'any' pattern and then the closest option within the levenshtein distance.
+    Unlike find_preference, an option of several words (like "modern european") is also compared with the same number of words
+    in front of the pattern. The utterance is tokenized once, the options of all slots are matched in one pass of a keyword automaton
+    and the levenshtein search uses a single deletion index over the options of all slots instead of comparing against every option.
+    The levenshtein distance is capped at the maximum distance of the index (max_fuzzy_distance), where the dynamic distance of
+    find_preference grows with the length of the word. So a long word which is misspelled in more than three places is no longer
+    matched, like "modreately" (four edits from "moderate"), and neither is an unrelated word which happens to be long, like
+    "brazilian" for "italian".
     """
-    smallest_distance = np.inf
-    best: str = None
-    pref = None
-    prev_word = ""
-    for option in options:
-        if option in user_utterance and option != "any":
-            # an exact match has been found
-            pref = option
-            return pref
-    # pattern matching
-    for word in user_utterance.split():
-        if word in patterns:
-            if prev_word == "any":
-                return "any"
-            break
-        prev_word = word
-    # levenshtein distance below maximum
-    for option in options:
-        distance = Levenshtein.distance(prev_word, option)
-        if distance < smallest_distance:
-            # if not defined
-            if max_levenshtein == 0:
-                max_levenshtein = len(prev_word)/2
-            smallest_distance = distance
-            best = option   
-    # If there is an option for levenshtein
-    if best:
-        if smallest_distance < max_levenshtein:
-            pref = best
-    return pref
-    
\ No newline at end of file
+    # the largest levenshtein distance of the search, larger distances would make the deletion index too large
+    max_fuzzy_distance = 3
+
+    def __init__(self, slots: Dict[str, Tuple[List[str], List[str]]]) -> None:
+        """Compile the vocabularies of the slots.
+
+        Args:
+            slots (Dict[str, Tuple[List[str], List[str]]]): The options and the patterns per slot name.
+        """
+        self.slot_names = list(slots.keys())
+        self.options = [options for options, _ in slots.values()]
+
+        # the exact matches of all slots in one automaton, with the slot and the position of the option as payload
+        self.automaton = KeywordAutomaton(
+            (option, (slot, rank)) for slot, options in enumerate(self.options) for rank, option in enumerate(options) if option != "any")
+
+        # the slots for which a word is a pattern
+        self.pattern_slots: Dict[str, List[int]] = {}
+        for slot, (_, patterns) in enumerate(slots.values()):
+            for pattern in set(patterns):
+                self.pattern_slots.setdefault(pattern, []).append(slot)
+
+        # the levenshtein search over the options of all slots, with the slot, the position and the number of words of the option as payload
+        # (ties are broken by the position of the option like the original find_preference does, the first occurrence of an option counts)
+        option_ranks = [{option: rank for rank, option in reversed(list(enumerate(options)))} for options in self.options]
+        self.fuzzy_index = FuzzyIndex(
+            ((option, (slot, rank, len(option.split()))) for slot, ranks in enumerate(option_ranks) for option, rank in ranks.items()),
+            max_distance=self.max_fuzzy_distance)
+        self.max_words = [max((len(option.split()) for option in options), default=1) for options in self.options]
+        # the same words come back over and over, so the levenshtein results are memoized (bounded in size)
+        self.fuzzy_cache: Dict[Tuple[int, Tuple[str, ...], int], Union[str, None]] = {}
+        self.max_fuzzy_cache_size = 10000
+
+    def extract(self, user_utterance: str, max_levenshtein: int = 0) -> Tuple[Union[str, None], ...]:
+        """Find the preferences for all slots in a sentence.
+
+        Args:
+            user_utterance (str): The input from the user.
+            max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
+
+        Returns:
+            Tuple[Union[str, None], ...]: The best found match or None for every slot, in the order of the slots.
+        """
+        n_slots = len(self.slot_names)
+
+        # exact matching, the first option in the list wins
+        exact_ranks: List[Union[int, None]] = [None] * n_slots
+        for _, (slot, rank) in self.automaton.find_all(user_utterance):
+            if exact_ranks[slot] is None or rank < exact_ranks[slot]:
+                exact_ranks[slot] = rank
+        preferences = [None if rank is None else self.options[slot][rank] for slot, rank in enumerate(exact_ranks)]
+        if all(preference is not None for preference in preferences):
+            return tuple(preferences)
+
+        # pattern matching, find the position in front of the first pattern of every slot
+        words = user_utterance.split()
+        pattern_found = [False] * n_slots
+        ends = [len(words)] * n_slots
+        for i, word in enumerate(words):
+            for slot in self.pattern_slots.get(word, ()):
+                if not pattern_found[slot]:
+                    pattern_found[slot] = True
+                    ends[slot] = i
+
+        for slot in range(n_slots):
+            if preferences[slot] is not None:
+                continue
+            end = ends[slot]
+            prev_word = words[end - 1] if end > 0 else ""
+            if pattern_found[slot] and prev_word == "any":
+                preferences[slot] = "any"
+                continue
+
+            # the spans of one or more words in front of the pattern (or at the end of the utterance)
+            spans = tuple(" ".join(words[end - n_words:end]) for n_words in range(1, min(self.max_words[slot], end) + 1)) or ("",)
+            preferences[slot] = self.find_closest(slot, spans, max_levenshtein)
+
+        return tuple(preferences)
+
+    def find_closest(self, slot: int, spans: Tuple[str, ...], max_levenshtein: int = 0) -> Union[str, None]:
+        """Find the closest option of a slot within the levenshtein distance of a span of words.
+
+        Args:
+            slot (int): The position of the slot.
+            spans (Tuple[str, ...]): The spans to match against the options, the single word against all options and a span of n words against the options of n words.
+            max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
+
+        Returns:
+            Union[str, None]: The closest option, preferring options of more words and then the first in the list of options on ties, or None.
+        """
+        key = (slot, spans, max_levenshtein)
+        if key in self.fuzzy_cache:
+            return self.fuzzy_cache[key]
+
+        best = None
+        for n_words, span in enumerate(spans, start=1):
+            for distance, option, (option_slot, rank, option_words) in self.fuzzy_index.search(span, self.get_max_distance(span, max_levenshtein)):
+                if option_slot != slot or (n_words > 1 and option_words != n_words) or (best is not None and (distance, -n_words, rank) >= best):
+                    continue
+                # every word of a span should be close to the word of the option as well, not only the span as a whole
+                if n_words > 1 and any(Levenshtein.distance(word, option_word) > self.get_max_distance(word, max_levenshtein)
+                                        for word, option_word in zip(span.split(), option.split())):
+                    continue
+                best = (distance, -n_words, rank)
+        closest = None if best is None else self.options[slot][best[2]]
+
+        if len(self.fuzzy_cache) >= self.max_fuzzy_cache_size:
+            self.fuzzy_cache.clear()
+        self.fuzzy_cache[key] = closest
+        return closest
+
+    def get_max_distance(self, span: str, max_levenshtein: int = 0) -> int:
+        """Get the maximum (inclusive) levenshtein distance for matching a span.
+
+        Args:
+            span (str): The span of words.
+            max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
+
+        Returns:
+            int: The maximum distance, at most max_fuzzy_distance.
+        """
+        # levenshtein distance below maximum (a dynamic maximum of half the span length when 0), the distance should be strictly smaller than the maximum
+        max_distance = max_levenshtein if max_levenshtein != 0 else len(span) / 2
+        return min(math.ceil(max_distance) - 1, self.max_fuzzy_distance)
+
+    def extract_batch(self, user_utterances: List[str], max_levenshtein: int = 0) -> List[Tuple[Union[str, None], ...]]:
+        """Find the preferences for all slots in a list of sentences, for example for an offline evaluation.
+
+        Args:
+            user_utterances (List[str]): The inputs from the user.
+            max_levenshtein (int, optional): the length of the levenshtein distance, if this is 0 than a dynamic levenshtein value is used. Defaults to 0.
+
+        Returns:
+            List[Tuple[Union[str, None], ...]]: The found preferences per sentence, in the order of the slots.
+        """
+        extract = self.extract
+        return [extract(user_utterance, max_levenshtein) for user_utterance in user_utterances]
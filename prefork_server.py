@@ -0,0 +1,275 @@
+"""Serve the dialog system from a pool of pre-forked worker processes.
+
+The parent process loads the intent model, the restaurant catalog and the shared dialog structures once,
+freezes them for the garbage collector and then forks the workers, so all workers share these pages
+copy-on-write instead of loading their own copy. The parent stays behind as a supervisor: it respawns
+workers which exit or stop sending heartbeats, forwards SIGHUP (settings reload) and reports the memory
+of every worker.
+
+Run from the root of the repository (only on platforms with os.fork):
+    python prefork_server.py --workers 4 --port 8765 --report-interval 60
+"""
+import argparse
+import asyncio
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import traceback
+
+from pathlib import Path
+from typing import Dict, Union
+
+from dialog_server import DialogEngine, serve
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from intent_classification import CachedIntentClassifier, NaiveBayesPredictor
+from model_store import load_or_train
+from restaurant_snapshot import load_catalog
+from settings import SettingsManager
+
+
+def get_memory_usage(pid: int) -> Union[Dict[str, float], None]:
+    """Get the memory use of a process from /proc (Linux only).
+    The proportional set size (PSS) divides every shared page over the processes sharing it,
+    so the PSS of the workers adds up to the memory they really use together.
+
+    Args:
+        pid (int): The id of the process.
+
+    Returns:
+        Union[Dict[str, float], None]: The rss, pss, shared and private memory in megabytes or None when it cannot be measured.
+    """
+    keys = {"Rss": "rss_mb", "Pss": "pss_mb", "Shared_Clean": "shared_mb", "Shared_Dirty": "shared_mb",
+            "Private_Clean": "private_mb", "Private_Dirty": "private_mb"}
+    usage = {"rss_mb": 0.0, "pss_mb": 0.0, "shared_mb": 0.0, "private_mb": 0.0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in keys:
+                    # the values are in kilobytes
+                    usage[keys[name]] += int(value.split()[0]) / 1024
+    except (OSError, ValueError):
+        return None
+    return usage
+
+
+class Supervisor:
+    """Forks the workers from the loaded parent process and keeps the pool healthy.
+    Every worker serves connections from the shared listening socket and writes a heartbeat into shared memory,
+    a worker which exits or whose heartbeat is older than the timeout is replaced by a fresh fork.
+    """
+
+    def __init__(self, engine: DialogEngine, listen_socket: socket.socket, n_workers: int, heartbeat_interval: float = 1.0,
+                    heartbeat_timeout: float = 30.0, respawn_delay: float = 1.0, watch_settings: bool = False,
+                    metrics_path: Union[Path, None] = None) -> None:
+        """Initialize the supervisor.
+
+        Args:
+            engine (DialogEngine): The loaded engine, inherited by every worker.
+            listen_socket (socket.socket): The listening socket shared by the workers.
+            n_workers (int): The number of worker processes.
+            heartbeat_interval (float, optional): The number of seconds between two heartbeats of a worker. Defaults to 1.0.
+            heartbeat_timeout (float, optional): The number of seconds without a heartbeat after which a worker is killed. Defaults to 30.0.
+            respawn_delay (float, optional): The minimum number of seconds between two forks for the same slot, against crash loops. Defaults to 1.0.
+            watch_settings (bool, optional): Whether the workers reload the settings whenever the .env file changes. Defaults to False.
+            metrics_path (Union[Path, None], optional): The JSON file for the metrics, every worker writes its own file with its slot in the name. Defaults to None.
+        """
+        self.engine = engine
+        self.listen_socket = listen_socket
+        self.n_workers = n_workers
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.respawn_delay = respawn_delay
+        self.watch_settings = watch_settings
+        self.metrics_path = metrics_path
+        # the last heartbeat of every worker slot (a monotonic time), in shared memory
+        self.heartbeats = multiprocessing.RawArray("d", n_workers)
+        # the pid of the worker per slot and the moment each slot was last forked
+        self.workers: Dict[int, int] = {}
+        self.spawned_at = [float("-inf")] * n_workers
+        self.respawns = 0
+        self.stopping = False
+
+    def spawn(self, slot: int) -> None:
+        """Fork a worker for a slot.
+
+        Args:
+            slot (int): The slot of the worker.
+        """
+        self.heartbeats[slot] = time.monotonic()
+        self.spawned_at[slot] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            # the worker never returns into the supervisor
+            try:
+                self.run_worker(slot)
+            except BaseException:
+                traceback.print_exc()
+                os._exit(1)
+            os._exit(0)
+        self.workers[pid] = slot
+
+    def run_worker(self, slot: int) -> None:
+        """The main function of a worker process.
+
+        Args:
+            slot (int): The slot of the worker.
+        """
+        # the signal handlers of the supervisor do not apply to the workers
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        self.engine.settings.install_reload_signal()
+        if self.watch_settings:
+            self.engine.settings.watch()
+        # the frozen objects of the parent stay untouched, only the objects of the worker are collected
+        gc.enable()
+
+        async def heartbeat() -> None:
+            while True:
+                self.heartbeats[slot] = time.monotonic()
+                await asyncio.sleep(self.heartbeat_interval)
+
+        metrics_path = None
+        if self.metrics_path is not None:
+            metrics_path = self.metrics_path.with_name(f"{self.metrics_path.stem}-{slot}{self.metrics_path.suffix}")
+            # the metrics recorded by a previous worker in this slot are not inherited
+            self.engine.instrumentation.reset()
+
+        async def main() -> None:
+            beat = asyncio.ensure_future(heartbeat())
+            try:
+                await serve(self.engine, sock=self.listen_socket, metrics_path=metrics_path)
+            finally:
+                beat.cancel()
+
+        asyncio.run(main())
+
+    def check(self) -> None:
+        """Reap the exited workers, kill the unresponsive ones and fill the empty slots.
+        """
+        while self.workers:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            self.workers.pop(pid, None)
+
+        now = time.monotonic()
+        for pid, slot in list(self.workers.items()):
+            if now - self.heartbeats[slot] > self.heartbeat_timeout:
+                # the event loop of the worker is stuck, it is replaced once it has been reaped
+                os.kill(pid, signal.SIGKILL)
+
+        occupied = set(self.workers.values())
+        for slot in range(self.n_workers):
+            if slot not in occupied and not self.stopping and now - self.spawned_at[slot] >= self.respawn_delay:
+                if self.spawned_at[slot] != float("-inf"):
+                    self.respawns += 1
+                self.spawn(slot)
+
+    def report_memory(self) -> None:
+        """Print the memory use of the supervisor and of every worker.
+        """
+        total = {"rss_mb": 0.0, "pss_mb": 0.0}
+        print(f"{'process':<16}{'rss_mb':>10}{'pss_mb':>10}{'shared_mb':>12}{'private_mb':>12}")
+        for name, pid in [("supervisor", os.getpid())] + [(f"worker {slot}", pid) for pid, slot in sorted(self.workers.items(), key=lambda item: item[1])]:
+            usage = get_memory_usage(pid)
+            if usage is None:
+                print(f"{name:<16}{'n/a':>10}")
+                continue
+            total["rss_mb"] += usage["rss_mb"]
+            total["pss_mb"] += usage["pss_mb"]
+            print(f"{name:<16}{usage['rss_mb']:>10.1f}{usage['pss_mb']:>10.1f}{usage['shared_mb']:>12.1f}{usage['private_mb']:>12.1f}")
+        print(f"{'total':<16}{total['rss_mb']:>10.1f}{total['pss_mb']:>10.1f}   (respawns: {self.respawns})")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Terminate all workers, killing the ones which do not exit within the timeout.
+
+        Args:
+            timeout (float, optional): The number of seconds to wait for the workers. Defaults to 5.0.
+        """
+        self.stopping = True
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + timeout
+        while self.workers and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.05)
+            else:
+                self.workers.pop(pid, None)
+        for pid in self.workers:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self, check_interval: float = 0.5, report_interval: float = 0.0) -> None:
+        """Supervise the workers until SIGTERM or SIGINT.
+
+        Args:
+            check_interval (float, optional): The number of seconds between two health checks. Defaults to 0.5.
+            report_interval (float, optional): The number of seconds between two memory reports, 0 disables the reports. Defaults to 0.0.
+        """
+        def request_stop(signum, frame) -> None:
+            self.stopping = True
+
+        def forward_reload(signum, frame) -> None:
+            for pid in self.workers:
+                os.kill(pid, signal.SIGHUP)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+        signal.signal(signal.SIGHUP, forward_reload)
+
+        # the loaded objects will never be freed, so keep the collector from writing to (and so copying) their pages
+        gc.collect()
+        gc.disable()
+        gc.freeze()
+
+        next_report = time.monotonic() + report_interval
+        try:
+            while not self.stopping:
+                self.check()
+                if report_interval > 0 and time.monotonic() >= next_report:
+                    self.report_memory()
+                    next_report = time.monotonic() + report_interval
+                time.sleep(check_interval)
+        finally:
+            self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the dialog system from a pool of pre-forked workers.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--session-ttl", type=float, default=900.0, help="seconds a session may stay idle")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="maximum number of sessions per worker")
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0, help="seconds without a heartbeat before a worker is replaced")
+    parser.add_argument("--report-interval", type=float, default=0.0, help="seconds between two memory reports, 0 disables them")
+    parser.add_argument("--watch-settings", action="store_true", help="reload the settings whenever the .env file changes")
+    parser.add_argument("--metrics-path", type=Path, default=None, help="JSON file to write the timings and counters to (one per worker), disabled by default")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        raise SystemExit("The pre-fork server needs os.fork, use dialog_server.py on this platform.")
+
+    # load everything the workers share once, before forking
+    settings = SettingsManager(Path(".env"))
+    intent_model = CachedIntentClassifier(load_or_train(NaiveBayesPredictor(), Path("./data/dialog_acts.dat"), Path("./models")))
+    restaurants = load_catalog(Path("./data/restaurant_info.csv"), Path("./models/restaurant_info.catalog"))
+    instrumentation = Instrumentation() if args.metrics_path is not None else NULL_INSTRUMENTATION
+    engine = DialogEngine(intent_model, restaurants, settings=settings, session_ttl=args.session_ttl, max_sessions=args.max_sessions, instrumentation=instrumentation)
+
+    # all workers accept from the same listening socket
+    listen_socket = socket.create_server((args.host, args.port))
+    listen_socket.setblocking(False)
+
+    print(f"Serving the dialog system on {args.host}:{args.port} with {args.workers} workers")
+    supervisor = Supervisor(engine, listen_socket, args.workers, heartbeat_timeout=args.heartbeat_timeout, watch_settings=args.watch_settings,
+                                metrics_path=args.metrics_path)
+    supervisor.run(report_interval=args.report_interval)
@@ -0,0 +1,86 @@
+import re
+
+from typing import Dict, List, Tuple, Union
+
+
+class Template:
+    """A system utterance with tags like <name>, compiled once into its literal segments and the slots between them.
+    Rendering fills in all slots in a single join instead of one str.replace per tag.
+    """
+    tag_pattern = re.compile(r"<(\w+)>")
+
+    def __init__(self, text: str) -> None:
+        """Compile the template.
+
+        Args:
+            text (str): The template text.
+        """
+        self.text = text
+        # the literal segments, with the name of the slot following each segment (None after the last segment)
+        self.segments: List[Tuple[str, Union[str, None]]] = []
+        position = 0
+        for match in self.tag_pattern.finditer(text):
+            self.segments.append((text[position:match.start()], match.group(1)))
+            position = match.end()
+        self.segments.append((text[position:], None))
+        self.slots = [slot for _, slot in self.segments if slot is not None]
+
+    def render(self, values: Dict[str, str]) -> str:
+        """Fill in the slots of the template.
+
+        Args:
+            values (Dict[str, str]): The value per slot name, slots without a value keep their tag.
+
+        Returns:
+            str: The rendered text.
+        """
+        if not self.slots:
+            return self.text
+        parts = []
+        for literal, slot in self.segments:
+            parts.append(literal)
+            if slot is not None:
+                parts.append(values.get(slot, f"<{slot}>"))
+        return "".join(parts)
+
+
+def compile_templates(dialog_choices: Dict[str, Dict[int, List[str]]]) -> Dict[str, Dict[int, List[Template]]]:
+    """Compile the system utterances of every register and dialog option.
+
+    Args:
+        dialog_choices (Dict[str, Dict[int, List[str]]]): The template texts per register ("formal"/"informal") and dialog option.
+
+    Returns:
+        Dict[str, Dict[int, List[Template]]]: The compiled templates in the same structure.
+    """
+    return {register: {option: [Template(text) for text in texts] for option, texts in options.items()} for register, options in dialog_choices.items()}
+
+
+def compile_explanations(implication_rules: Dict[str, Dict[str, List[str]]]) -> Dict[str, str]:
+    """Precompute the sentence explaining the choice of a restaurant for every implication rule.
+
+    Args:
+        implication_rules (Dict[str, Dict[str, List[str]]]): The antecedents and texts per additional requirement.
+
+    Raises:
+        NotImplementedError: When a rule has more than three antecedents.
+
+    Returns:
+        Dict[str, str]: The explanation per additional requirement, starting on a new line.
+    """
+    explanations = {}
+    for requirement, rule in implication_rules.items():
+        # setup the reasoning text for explaining the choice (reason0 is reserved for the consequence)
+        n_antecedents = len(rule.get("antecedents"))
+        if n_antecedents == 1:
+            template = Template("\nThe restaurant is <reason0> because it <reason1>.")
+        elif n_antecedents == 2:
+            template = Template("\nThe restaurant is <reason0> because it <reason1> and <reason2>.")
+        elif n_antecedents == 3:
+            template = Template("\nThe restaurant is <reason0> because it <reason1>, <reason2> and <reason3>.")
+        else:
+            raise NotImplementedError("A maximum of three antecendents can be used for the reasoning component.")
+
+        # fill in the templates using the texts
+        explanations[requirement] = template.render({f"reason{i}": text for i, text in enumerate(rule.get("texts"))})
+    return explanations
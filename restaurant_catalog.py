@@ -0,0 +1,171 @@
+import csv
+import numpy as np
+
+from dataclasses import fields
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from utils import Restaurant
+
+
+class RestaurantView:
+    """A lightweight view of a single restaurant in a RestaurantCatalog, it only holds the catalog and the restaurant id.
+    The attributes are decoded from the columns of the catalog when they are read, so a view behaves like a Restaurant.
+    """
+    __slots__ = ("catalog", "restaurant_id")
+
+    def __init__(self, catalog: "RestaurantCatalog", restaurant_id: int) -> None:
+        self.catalog = catalog
+        self.restaurant_id = restaurant_id
+
+    def __getattr__(self, field: str) -> str:
+        # only called for the attributes which are not slots, the restaurant attributes are decoded from the catalog
+        if field in self.__slots__ or field not in self.catalog.columns:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{field}'")
+        return self.catalog.get_value(field, self.restaurant_id)
+
+    def get_restaurant_properties(self) -> Tuple[str, str, str, str, str]:
+        return self.pricerange, self.cuisine, self.quality, self.crowdedness, self.length_of_stay
+
+    def to_restaurant(self) -> Restaurant:
+        """Decode all attributes at once.
+
+        Returns:
+            Restaurant: The restaurant as a dataclass.
+        """
+        return Restaurant(*(self.catalog.get_value(field, self.restaurant_id) for field in self.catalog.fields))
+
+    def __eq__(self, other: object) -> bool:
+        # like the Restaurant dataclass, restaurants with the same attributes are equal
+        if isinstance(other, RestaurantView):
+            if other.catalog is self.catalog and other.restaurant_id == self.restaurant_id:
+                return True
+            return self.to_restaurant() == other.to_restaurant()
+        if isinstance(other, Restaurant):
+            return self.to_restaurant() == other
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.catalog.get_value(field, self.restaurant_id) for field in self.catalog.fields))
+
+    def __repr__(self):
+        return f"(name='{self.name}', pricerange='{self.pricerange}', area='{self.area}', food='{self.cuisine}', phone='{self.phone}', address='{self.address}', postcode='{self.postcode}')"
+
+
+class RestaurantCatalog:
+    """A compact, read-only table of restaurants which stores every attribute as a dictionary encoded column.
+    A column holds one small integer code per restaurant, which indexes the sorted table of the distinct values of the attribute.
+    Restaurants are only materialized as RestaurantView objects when they are looked up, so a single catalog
+    of many restaurants can be shared cheaply. A restaurant id is the position of the restaurant in the catalog.
+    """
+    # the attributes of a restaurant, in the order of the columns of the csv file
+    fields = tuple(field.name for field in fields(Restaurant))
+
+    def __init__(self, columns: Dict[str, np.ndarray], strings: Dict[str, Sequence[str]],
+                    postings: Union[Dict[str, Dict[str, np.ndarray]], None] = None) -> None:
+        """Initialize the catalog from its columns.
+
+        Args:
+            columns (Dict[str, np.ndarray]): The codes of every restaurant per attribute.
+            strings (Dict[str, Sequence[str]]): The distinct values per attribute, indexed by the codes.
+            postings (Union[Dict[str, Dict[str, np.ndarray]], None], optional): Precomputed bitsets for the RestaurantIndex, None builds them from the columns. Defaults to None.
+        """
+        self.columns = columns
+        self.strings = strings
+        self.postings = postings
+        self.n_restaurants = len(columns[self.fields[0]]) if columns else 0
+        # the distinct (non empty) values per attribute, filled on demand
+        self.vocabularies: Dict[str, List[str]] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterator[List[str]]) -> "RestaurantCatalog":
+        """Build the catalog from rows holding the attributes of a restaurant (in the order of the fields).
+
+        Args:
+            rows (Iterator[List[str]]): The rows of the restaurants.
+
+        Returns:
+            RestaurantCatalog: The catalog of the restaurants.
+        """
+        codes: Dict[str, Dict[str, int]] = {field: {} for field in cls.fields}
+        raw_columns: Dict[str, List[int]] = {field: [] for field in cls.fields}
+        for row in rows:
+            for field, value in zip(cls.fields, row):
+                raw_columns[field].append(codes[field].setdefault(value, len(codes[field])))
+
+        columns, strings = {}, {}
+        for field in cls.fields:
+            # renumber the codes so the string table is sorted
+            values = sorted(codes[field])
+            renumber = np.empty(len(values), dtype=np.int64)
+            for code, value in enumerate(values):
+                renumber[codes[field][value]] = code
+            dtype = np.min_scalar_type(max(len(values) - 1, 0))
+            columns[field] = renumber[np.asarray(raw_columns[field], dtype=np.int64)].astype(dtype)
+            strings[field] = values
+        return cls(columns, strings)
+
+    @classmethod
+    def from_restaurants(cls, restaurants: List[Restaurant]) -> "RestaurantCatalog":
+        """Build the catalog from a list of restaurants.
+
+        Args:
+            restaurants (List[Restaurant]): The restaurants.
+
+        Returns:
+            RestaurantCatalog: The catalog of the restaurants, in the same order.
+        """
+        return cls.from_rows([getattr(restaurant, field) for field in cls.fields] for restaurant in restaurants)
+
+    @classmethod
+    def from_csv(cls, file_path: Path) -> "RestaurantCatalog":
+        """Load the catalog from the csv containing information about restaurants.
+
+        Args:
+            file_path (Path): The path to the csv file.
+
+        Returns:
+            RestaurantCatalog: The catalog of the restaurants.
+        """
+        with open(file_path) as csv_file:
+            csv_reader = csv.reader(csv_file, delimiter=',')
+            # skip the first line
+            next(csv_reader, None)
+            return cls.from_rows(csv_reader)
+
+    def __len__(self) -> int:
+        return self.n_restaurants
+
+    def __getitem__(self, restaurant_id: int) -> RestaurantView:
+        if not -self.n_restaurants <= restaurant_id < self.n_restaurants:
+            raise IndexError("restaurant id out of range")
+        return RestaurantView(self, int(restaurant_id) % self.n_restaurants)
+
+    def __iter__(self) -> Iterator[RestaurantView]:
+        return (RestaurantView(self, restaurant_id) for restaurant_id in range(self.n_restaurants))
+
+    def get_vocabulary(self, field: str) -> List[str]:
+        """Get the distinct values of an attribute, like the areas the user can ask for.
+
+        Args:
+            field (str): The attribute.
+
+        Returns:
+            List[str]: The sorted distinct values, without the empty value.
+        """
+        vocabulary = self.vocabularies.get(field)
+        if vocabulary is None:
+            vocabulary = self.vocabularies[field] = [value for value in self.strings[field] if value != ""]
+        return vocabulary
+
+    def get_value(self, field: str, restaurant_id: int) -> str:
+        """Decode the value of an attribute of a restaurant.
+
+        Args:
+            field (str): The attribute.
+            restaurant_id (int): The id of the restaurant.
+
+        Returns:
+            str: The value of the attribute.
+        """
+        return self.strings[field][self.columns[field][restaurant_id]]
@@ -0,0 +1,97 @@
+import numpy as np
+
+from typing import Dict, Iterable, Union
+
+from restaurant_catalog import RestaurantCatalog
+
+
+class RestaurantIndex:
+    """An inverted index from the values of the restaurant attributes to bitsets of restaurant ids.
+    The index is built once when the restaurants are loaded, after which filtering comes down to intersecting bitsets.
+    A bitset is a numpy array of 64 bit words in which bit i is set when restaurant i has the value.
+    """
+    # the attributes which are indexed
+    fields = ("area", "cuisine", "pricerange", "quality", "crowdedness", "length_of_stay")
+    # the attributes returned by Restaurant.get_restaurant_properties, which are used by the implication rules
+    property_fields = ("pricerange", "cuisine", "quality", "crowdedness", "length_of_stay")
+
+    def __init__(self, restaurants: RestaurantCatalog) -> None:
+        """Build the index over the restaurants.
+
+        Args:
+            restaurants (RestaurantCatalog): The restaurants to index, a restaurant id is its position in the catalog.
+        """
+        self.restaurants = restaurants
+        self.n_words = (len(restaurants) + 63) // 64
+        self.empty_bits = np.zeros(self.n_words, dtype=np.uint64)
+        self.all_bits = np.packbits(np.arange(self.n_words * 64) < len(restaurants), bitorder="little").view(np.uint64)
+
+        # the posting bitsets per attribute value, precomputed by a snapshot of the catalog or built from the dictionary encoded columns
+        self.postings: Dict[str, Dict[str, np.ndarray]] = dict(restaurants.postings or {})
+        for field in self.fields:
+            if field in self.postings:
+                continue
+            column = restaurants.columns[field]
+            order = np.argsort(column, kind="stable")
+            bounds = np.searchsorted(column[order], np.arange(len(restaurants.strings[field]) + 1))
+            self.postings[field] = {
+                value: self.to_bits(order[bounds[code]:bounds[code + 1]])
+                for code, value in enumerate(restaurants.strings[field]) if bounds[code] < bounds[code + 1]}
+
+        # the union over the property attributes per value, filled on demand
+        self.property_bits: Dict[str, np.ndarray] = {}
+
+    def to_bits(self, restaurant_ids: Iterable[int]) -> np.ndarray:
+        """Convert restaurant ids into a bitset.
+
+        Args:
+            restaurant_ids (Iterable[int]): The ids of the restaurants.
+
+        Returns:
+            np.ndarray: The bitset holding the ids.
+        """
+        flags = np.zeros(self.n_words * 64, dtype=bool)
+        flags[np.fromiter(restaurant_ids, dtype=np.int64)] = True
+        return np.packbits(flags, bitorder="little").view(np.uint64)
+
+    def to_ids(self, bits: np.ndarray) -> np.ndarray:
+        """Convert a bitset into the ids of the restaurants, in ascending order.
+
+        Args:
+            bits (np.ndarray): The bitset.
+
+        Returns:
+            np.ndarray: The ids held by the bitset.
+        """
+        return np.flatnonzero(np.unpackbits(bits.view(np.uint8), bitorder="little"))
+
+    def get_bits(self, field: str, value: Union[str, None]) -> np.ndarray:
+        """Get the bitset of the restaurants with a value for an attribute, "any" matches every restaurant.
+
+        Args:
+            field (str): The attribute of the restaurants.
+            value (Union[str, None]): The value of the attribute.
+
+        Returns:
+            np.ndarray: The bitset of the matching restaurants (do not modify it).
+        """
+        if value == "any":
+            return self.all_bits
+        return self.postings[field].get(value, self.empty_bits)
+
+    def get_property_bits(self, value: str) -> np.ndarray:
+        """Get the bitset of the restaurants which have the value as one of their properties.
+
+        Args:
+            value (str): The value of the property, like "cheap" or "busy".
+
+        Returns:
+            np.ndarray: The bitset of the matching restaurants (do not modify it).
+        """
+        bits = self.property_bits.get(value)
+        if bits is None:
+            bits = self.empty_bits.copy()
+            for field in self.property_fields:
+                bits |= self.postings[field].get(value, self.empty_bits)
+            self.property_bits[value] = bits
+        return bits
@@ -0,0 +1,271 @@
+import numpy as np
+
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
+
+from implication_rules import ImplicationRule
+from restaurant_catalog import RestaurantView
+from restaurant_index import RestaurantIndex
+
+
+# the tolerance when comparing scores, which are sums of fractions
+EPSILON = 1e-6
+
+
+class Recommendation(NamedTuple):
+    """A suggested restaurant with its score.
+    An exact recommendation matches all preferences of the user, a near one misses (part of) one preference.
+    """
+    restaurant: RestaurantView
+    score: float
+    exact: bool
+    meets_requirement: bool
+
+
+class Recommendations:
+    """The ranked recommendations for one set of preferences, handed out lazily.
+    The restaurants are held as a bitset per score level, the highest score first; within a level the restaurant loaded last
+    comes first (the order in which the restaurants used to be popped). Every next recommendation takes the highest set bit
+    of the level, so the memory is one bit per restaurant and level, however many restaurants qualify.
+    """
+
+    def __init__(self, index: RestaurantIndex, levels: List[Tuple[float, np.ndarray]], max_score: float, requirement_bits: Union[np.ndarray, None] = None,
+                    exclude: Iterable[int] = ()) -> None:
+        """Initialize the recommendations.
+
+        Args:
+            index (RestaurantIndex): The index over the restaurants.
+            levels (List[Tuple[float, np.ndarray]]): The score and the bitset of the restaurants with that score, the highest score first (not modified).
+            max_score (float): The score of a restaurant matching all preferences.
+            requirement_bits (Union[np.ndarray, None], optional): The bitset of the restaurants meeting the additional requirement, None when there is none. Defaults to None.
+            exclude (Iterable[int], optional): The ids of the restaurants which should not be recommended. Defaults to ().
+        """
+        self.index = index
+        self.max_score = max_score
+        self.requirement_bits = requirement_bits
+        exclude = np.fromiter(exclude, dtype=np.int64)
+        # the bits are cleared as the restaurants are handed out, so the levels are copied
+        self.levels: List[Tuple[float, np.ndarray]] = []
+        for score, bits in levels:
+            bits = bits.copy()
+            if len(exclude):
+                np.bitwise_and.at(bits, exclude >> 6, ~(np.uint64(1) << (exclude & 63).astype(np.uint64)))
+            self.levels.append((score, bits))
+        # the level handed out now, its words holding restaurants (found when the level is reached) and the position of the last of them
+        self.level = 0
+        self.words: Union[np.ndarray, None] = None
+        self.position = -1
+
+    def __len__(self) -> int:
+        return sum(int(np.unpackbits(bits.view(np.uint8)).sum()) for _, bits in self.levels[self.level:])
+
+    def __iter__(self) -> "Recommendations":
+        return self
+
+    def __next__(self) -> Recommendation:
+        while self.level < len(self.levels):
+            score, bits = self.levels[self.level]
+            if self.words is None:
+                self.words = np.flatnonzero(bits)
+                self.position = len(self.words) - 1
+            if self.position >= 0:
+                word_id = int(self.words[self.position])
+                word = int(bits[word_id])
+                bit = word.bit_length() - 1
+                bits[word_id] = word ^ (1 << bit)
+                if bits[word_id] == 0:
+                    self.position -= 1
+                return self.to_recommendation(score, word_id * 64 + bit)
+            self.level += 1
+            self.words = None
+        raise StopIteration
+
+    def to_recommendation(self, score: float, restaurant_id: int) -> Recommendation:
+        meets_requirement = self.requirement_bits is None or bool(int(self.requirement_bits[restaurant_id >> 6]) >> (restaurant_id & 63) & 1)
+        return Recommendation(self.index.restaurants[restaurant_id], score, score >= self.max_score - EPSILON, meets_requirement)
+
+
+class Recommender:
+    """Scores the restaurants on the preferences of the user and ranks them.
+    Every preference (area, cuisine, pricerange and the additional requirement) is worth one point: a restaurant gets the point
+    for an exact match, half of it for a near value (like a moderate instead of a cheap pricerange) and, for the additional
+    requirement, the fraction of the properties of its implication rule it has. Preferences without a value or with "any" are not scored.
+    The restaurants matching all preferences are recommended, only when there are none the ones missing at most one point are recommended instead.
+    The score arrays per preferred value are computed once and shared by all sessions, the recommender holds no session state,
+    so one instance is shared by all dialog managers.
+    """
+    # the values which come close to a preferred value
+    near_values: Dict[str, Dict[str, Tuple[str, ...]]] = {
+        "pricerange": {"cheap": ("moderate",), "moderate": ("cheap", "expensive"), "expensive": ("moderate",)},
+    }
+    near_score = 0.5
+    # the number of points a near recommendation may miss
+    max_missing = 1.0
+
+    def __init__(self, restaurant_index: RestaurantIndex) -> None:
+        """Initialize the recommender.
+
+        Args:
+            restaurant_index (RestaurantIndex): The index over the restaurants.
+        """
+        self.index = restaurant_index
+        self.n_restaurants = len(restaurant_index.restaurants)
+        # the score arrays per (attribute, value) and per properties of an implication rule, filled on demand
+        self.slot_scores: Dict[Tuple[str, str], np.ndarray] = {}
+        self.requirement_scores: Dict[Tuple[str, ...], np.ndarray] = {}
+
+    def to_flags(self, bits: np.ndarray) -> np.ndarray:
+        """Convert a bitset into a boolean per restaurant.
+
+        Args:
+            bits (np.ndarray): The bitset.
+
+        Returns:
+            np.ndarray: Whether every restaurant is in the bitset.
+        """
+        return np.unpackbits(bits.view(np.uint8), bitorder="little", count=self.n_restaurants).astype(bool)
+
+    def get_slot_bits(self, slot: str, value: Union[str, ImplicationRule]) -> np.ndarray:
+        """Get the shared bitset of the restaurants scoring the full point for a preferred value.
+
+        Args:
+            slot (str): The preference, like "pricerange" or "additional_requirement".
+            value (Union[str, ImplicationRule]): The preferred value, the compiled rule for the additional requirement.
+
+        Returns:
+            np.ndarray: The bitset of the restaurants (do not modify it).
+        """
+        return value.bits if slot == "additional_requirement" else self.index.get_bits(slot, value)
+
+    def get_exact_bits(self, values: Dict[str, Union[str, ImplicationRule]]) -> np.ndarray:
+        """Get the bitset of the restaurants matching all preferences, from the shared bitsets of the index and the rules.
+
+        Args:
+            values (Dict[str, Union[str, ImplicationRule]]): The scored value per preference, the compiled rule for the additional requirement.
+
+        Returns:
+            np.ndarray: The bitset of the restaurants scoring all points (do not modify it).
+        """
+        bits = self.index.all_bits
+        for slot, value in values.items():
+            bits = bits & self.get_slot_bits(slot, value)
+        return bits
+
+    def get_near_levels(self, values: Dict[str, Union[str, ImplicationRule]]) -> List[Tuple[float, np.ndarray]]:
+        """Score the restaurants missing at most max_missing points, for when no restaurant matches all preferences.
+        The scores are summed from the shared score arrays and only the bitsets per score are kept.
+
+        Args:
+            values (Dict[str, Union[str, ImplicationRule]]): The scored value per preference, the compiled rule for the additional requirement.
+
+        Returns:
+            List[Tuple[float, np.ndarray]]: The score and the bitset of the restaurants with that score, the highest score first.
+        """
+        scores = np.zeros(self.n_restaurants, dtype=np.float64)
+        for slot, value in values.items():
+            scores += self.get_requirement_scores(value) if slot == "additional_requirement" else self.get_slot_scores(slot, value)
+        candidates = np.flatnonzero(scores >= len(values) - self.max_missing - EPSILON)
+        # the scores are rounded so the sums of fractions compare equal
+        candidate_scores = np.round(scores[candidates], 6)
+        return [(float(score), self.index.to_bits(candidates[candidate_scores == score])) for score in np.unique(candidate_scores)[::-1]]
+
+    def get_slot_scores(self, field: str, value: str) -> np.ndarray:
+        """Score the restaurants on a preferred value of an attribute.
+
+        Args:
+            field (str): The attribute, like "pricerange".
+            value (str): The preferred value.
+
+        Returns:
+            np.ndarray: The score of every restaurant, 1 for the value, near_score for a near value and 0 otherwise (do not modify it).
+        """
+        scores = self.slot_scores.get((field, value))
+        if scores is None:
+            scores = self.to_flags(self.index.get_bits(field, value)).astype(np.float64)
+            for near_value in self.near_values.get(field, {}).get(value, ()):
+                scores[self.to_flags(self.index.get_bits(field, near_value))] = self.near_score
+            scores.flags.writeable = False
+            self.slot_scores[(field, value)] = scores
+        return scores
+
+    def get_requirement_scores(self, rule: ImplicationRule) -> np.ndarray:
+        """Score the restaurants on the properties of a compiled implication rule.
+
+        Args:
+            rule (ImplicationRule): The rule of the additional requirement.
+
+        Returns:
+            np.ndarray: The fraction of the properties every restaurant has (do not modify it).
+        """
+        scores = self.requirement_scores.get(rule.properties)
+        if scores is None:
+            scores = np.zeros(self.n_restaurants, dtype=np.float64)
+            for bits in rule.property_bits:
+                scores += self.to_flags(bits)
+            if rule.properties:
+                scores /= len(rule.properties)
+            scores.flags.writeable = False
+            self.requirement_scores[rule.properties] = scores
+        return scores
+
+
+class RankingCache:
+    """The ranking state of a single session, updated one preference at a time.
+    The session only keeps the bitset of the restaurants matching all preferences, allocated at the first ranking. Adding a
+    preference (like going from "any" to "italian") can only remove restaurants, so the cached bitset is narrowed with the
+    shared bitset of that preference; changing or removing one (going back to "any") intersects the shared bitsets again.
+    The scores of the near restaurants are only computed when no restaurant matches all preferences.
+    """
+    # the preferences which are scored, in the order of the arguments of rank
+    slots = ("area", "cuisine", "pricerange", "additional_requirement")
+
+    def __init__(self, recommender: Recommender) -> None:
+        """Initialize the cache without any preferences.
+
+        Args:
+            recommender (Recommender): The shared recommender.
+        """
+        self.recommender = recommender
+        # the scored value per preference
+        self.values: Dict[str, Union[str, ImplicationRule]] = {}
+        # the bitset of the restaurants matching all preferences, None when there was no ranking yet
+        self.exact_bits: Union[np.ndarray, None] = None
+
+    @property
+    def max_score(self) -> float:
+        return float(len(self.values))
+
+    def rank(self, area: Union[str, None], cuisine: Union[str, None], pricerange: Union[str, None], requirement: Union[ImplicationRule, None] = None,
+                exclude: Iterable[int] = ()) -> Recommendations:
+        """Rank the restaurants on the (changed) preferences of the user.
+
+        Args:
+            area (Union[str, None]): The preferred area.
+            cuisine (Union[str, None]): The preferred cuisine.
+            pricerange (Union[str, None]): The preferred pricerange.
+            requirement (Union[ImplicationRule, None], optional): The compiled implication rule of the additional requirement. Defaults to None.
+            exclude (Iterable[int], optional): The ids of the restaurants which should not be recommended, like the ones already suggested. Defaults to ().
+
+        Returns:
+            Recommendations: The recommendations, best first.
+        """
+        # only the preferences which are scored, without a value or with "any" a preference is left out
+        values = dict(zip(self.slots, (area, cuisine, pricerange, requirement)))
+        values = {slot: value for slot, value in values.items() if value and value != "any"}
+
+        # the restaurants only keep matching when preferences are added, not when they are changed or removed
+        narrowing = self.exact_bits is not None and all(values.get(slot) == value for slot, value in self.values.items())
+        if narrowing:
+            for slot, value in values.items():
+                if slot not in self.values:
+                    self.exact_bits = self.exact_bits & self.recommender.get_slot_bits(slot, value)
+        else:
+            self.exact_bits = self.recommender.get_exact_bits(values)
+        self.values = values
+
+        # the near restaurants are only recommended when no restaurant matches all preferences, whether it was suggested already or not
+        if self.exact_bits.any():
+            levels = [(self.max_score, self.exact_bits)]
+        else:
+            levels = self.recommender.get_near_levels(values)
+        requirement_bits = values["additional_requirement"].bits if "additional_requirement" in values else None
+        return Recommendations(self.recommender.index, levels, self.max_score, requirement_bits, exclude)
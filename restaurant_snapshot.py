@@ -0,0 +1,194 @@
+"""A versioned binary snapshot of the restaurant catalog, which is memory-mapped instead of parsed.
+
+The snapshot holds the code columns, the string tables and the posting bitsets of the RestaurantIndex,
+every block aligned to 8 bytes behind a small JSON header. Loading only reads the header and maps the file,
+so it takes the same time for any number of restaurants, and worker processes share the pages read-only.
+
+Compile the snapshot from the root of the repository with:
+    python restaurant_snapshot.py --csv ./data/restaurant_info.csv --snapshot ./models/restaurant_info.catalog
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Union
+
+from restaurant_catalog import RestaurantCatalog
+from restaurant_index import RestaurantIndex
+
+
+# changed whenever the layout of the snapshot changes, older snapshots are ignored
+SNAPSHOT_VERSION = 1
+MAGIC = b"RCATSNAP"
+
+
+class StringTable:
+    """The string table of an attribute inside a snapshot, the strings are decoded when they are read.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: memoryview) -> None:
+        """Initialize the table.
+
+        Args:
+            offsets (np.ndarray): The start of every string in the data, followed by the end of the last string.
+            data (memoryview): The utf-8 encoded strings, one after the other.
+        """
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, code: int) -> str:
+        return str(self.data[self.offsets[code]:self.offsets[code + 1]], "utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return (self[code] for code in range(len(self)))
+
+
+def get_source_stamp(csv_path: Path) -> Dict[str, int]:
+    """Get the size and modification time of the csv file, a snapshot is stale when these changed.
+
+    Args:
+        csv_path (Path): The path to the csv file.
+
+    Returns:
+        Dict[str, int]: The size in bytes and the modification time in nanoseconds.
+    """
+    stat = csv_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def compile_snapshot(csv_path: Path, snapshot_path: Path) -> RestaurantCatalog:
+    """Convert the csv containing information about restaurants into a snapshot.
+
+    Args:
+        csv_path (Path): The path to the csv file.
+        snapshot_path (Path): The path to write the snapshot to.
+
+    Returns:
+        RestaurantCatalog: The catalog which was written.
+    """
+    stamp = get_source_stamp(csv_path)
+    catalog = RestaurantCatalog.from_csv(csv_path)
+    index = RestaurantIndex(catalog)
+
+    blocks: List[bytes] = []
+    size = 0
+
+    def add_block(block: bytes) -> int:
+        # every block starts at a multiple of 8 bytes (relative to the data section), so the arrays are aligned
+        nonlocal size
+        offset = size
+        padding = -len(block) % 8
+        blocks.append(block + b"\0" * padding)
+        size += len(block) + padding
+        return offset
+
+    header = {"version": SNAPSHOT_VERSION, "source": stamp, "n_restaurants": len(catalog), "n_words": index.n_words,
+              "columns": {}, "strings": {}, "postings": {}}
+    for field in catalog.fields:
+        column = catalog.columns[field]
+        header["columns"][field] = {"dtype": column.dtype.str, "offset": add_block(column.tobytes())}
+
+        encoded = [value.encode("utf-8") for value in catalog.strings[field]]
+        offsets = np.concatenate([[0], np.cumsum([len(value) for value in encoded], dtype=np.uint64)]).astype(np.uint64)
+        header["strings"][field] = {"count": len(encoded), "offsets": add_block(offsets.tobytes()), "data": add_block(b"".join(encoded)), "size": int(offsets[-1])}
+
+    for field in index.fields:
+        # one row of bits per code of the attribute, the empty bitset for codes without restaurants
+        values = catalog.strings[field]
+        bits = np.stack([index.postings[field].get(value, index.empty_bits) for value in values]) if len(values) else np.zeros((0, index.n_words), dtype=np.uint64)
+        header["postings"][field] = add_block(np.ascontiguousarray(bits, dtype=np.uint64).tobytes())
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # write to a temporary file first so a worker never maps a half written snapshot
+    tmp_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp_path, snapshot_path)
+    return catalog
+
+
+def load_snapshot(snapshot_path: Path, csv_path: Union[Path, None] = None) -> Union[RestaurantCatalog, None]:
+    """Memory-map a snapshot as a read-only catalog.
+
+    Args:
+        snapshot_path (Path): The path to the snapshot.
+        csv_path (Union[Path, None], optional): The csv file the snapshot was compiled from, to check whether it is stale. Defaults to None.
+
+    Returns:
+        Union[RestaurantCatalog, None]: The catalog or None when the snapshot is missing, corrupt, of another version or stale.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # a missing or empty snapshot
+        return None
+
+    try:
+        if buffer[:len(MAGIC)] != MAGIC:
+            return None
+        header_size, = struct.unpack_from("<I", buffer, len(MAGIC))
+        start = len(MAGIC) + 4 + header_size
+        header = json.loads(bytes(buffer[len(MAGIC) + 4:start]))
+        if header.get("version") != SNAPSHOT_VERSION:
+            return None
+        if csv_path is not None and csv_path.exists() and header.get("source") != get_source_stamp(csv_path):
+            # the csv changed after the snapshot was compiled
+            return None
+
+        n_restaurants, n_words = header["n_restaurants"], header["n_words"]
+        columns, strings, postings = {}, {}, {}
+        for field in RestaurantCatalog.fields:
+            column = header["columns"][field]
+            columns[field] = np.frombuffer(buffer, dtype=np.dtype(column["dtype"]), count=n_restaurants, offset=start + column["offset"])
+            table = header["strings"][field]
+            offsets = np.frombuffer(buffer, dtype=np.uint64, count=table["count"] + 1, offset=start + table["offsets"])
+            strings[field] = StringTable(offsets, memoryview(buffer)[start + table["data"]:start + table["data"] + table["size"]])
+
+        for field, offset in header["postings"].items():
+            bits = np.frombuffer(buffer, dtype=np.uint64, count=len(strings[field]) * n_words, offset=start + offset).reshape(-1, n_words)
+            postings[field] = {value: bits[code] for code, value in enumerate(strings[field])}
+    except (KeyError, TypeError, ValueError, struct.error):
+        # a corrupt or truncated snapshot is treated as a missing one
+        return None
+
+    return RestaurantCatalog(columns, strings, postings=postings)
+
+
+def load_catalog(csv_path: Path, snapshot_path: Union[Path, None] = None) -> RestaurantCatalog:
+    """Load the restaurant catalog from its snapshot, or from the csv file when the snapshot is missing or stale.
+
+    Args:
+        csv_path (Path): The path to the csv file.
+        snapshot_path (Union[Path, None], optional): The path to the snapshot, None always parses the csv file. Defaults to None.
+
+    Returns:
+        RestaurantCatalog: The catalog of the restaurants.
+    """
+    if snapshot_path is not None:
+        catalog = load_snapshot(snapshot_path, csv_path)
+        if catalog is not None:
+            return catalog
+    return RestaurantCatalog.from_csv(csv_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the restaurant csv file into a binary snapshot.")
+    parser.add_argument("--csv", type=Path, default=Path("./data/restaurant_info.csv"))
+    parser.add_argument("--snapshot", type=Path, default=Path("./models/restaurant_info.catalog"))
+    args = parser.parse_args()
+
+    catalog = compile_snapshot(args.csv, args.snapshot)
+    print(f"Wrote {len(catalog)} restaurants to {args.snapshot} ({args.snapshot.stat().st_size} bytes)")
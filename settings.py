@@ -0,0 +1,115 @@
+import signal
+import threading
+import time
+
+from dataclasses import dataclass, fields
+from decouple import Config, RepositoryEmpty, RepositoryEnv
+from pathlib import Path
+from typing import Union
+
+
+@dataclass(frozen=True)
+class Settings:
+    """An immutable snapshot of the configurable variables of the dialog system.
+    """
+    # development variables
+    debug: bool = False
+    # configurable variables
+    levenshtein_distance: int = 0
+    formal: bool = True
+    use_caps: bool = False
+    allow_restart: bool = True
+    use_delay: bool = False
+    use_tts: bool = False
+    # Text-To-Speech variables
+    tts_rate: int = 200
+    tts_volume: float = 1.0
+    tts_voice: int = 0
+
+    @classmethod
+    def from_env(cls, env_path: Path = Path(".env")) -> "Settings":
+        """Read the settings from the environment and the .env file, the environment takes precedence.
+
+        Args:
+            env_path (Path, optional): The path to the .env file. Defaults to Path(".env").
+
+        Returns:
+            Settings: The settings, variables which are not set get their default value.
+        """
+        repository = RepositoryEnv(str(env_path)) if env_path.exists() else RepositoryEmpty()
+        config = Config(repository)
+        return cls(**{field.name: config(field.name, default=field.default, cast=field.type) for field in fields(cls)})
+
+
+class SettingsManager:
+    """Holds the current settings, which are loaded once and only replaced by an explicit reload.
+    Readers get the immutable snapshot from `current`, a reload swaps it for a new snapshot.
+    """
+
+    def __init__(self, env_path: Path = Path(".env")) -> None:
+        """Load the settings.
+
+        Args:
+            env_path (Path, optional): The path to the .env file. Defaults to Path(".env").
+        """
+        self.env_path = env_path
+        # reentrant, as the reload signal can interrupt the main thread while it is reloading
+        self.lock = threading.RLock()
+        self.env_mtime = self.get_env_mtime()
+        self.current = Settings.from_env(env_path)
+
+    def get_env_mtime(self) -> Union[int, None]:
+        """Get the modification time of the .env file.
+
+        Returns:
+            Union[int, None]: The modification time in nanoseconds or None when the file does not exist.
+        """
+        try:
+            return self.env_path.stat().st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self) -> Settings:
+        """Read the settings again and make them the current settings.
+
+        Returns:
+            Settings: The new settings.
+        """
+        with self.lock:
+            self.env_mtime = self.get_env_mtime()
+            self.current = Settings.from_env(self.env_path)
+            return self.current
+
+    def install_reload_signal(self, signal_number: Union[int, None] = getattr(signal, "SIGHUP", None)) -> bool:
+        """Reload the settings whenever the process receives a signal (SIGHUP by default).
+        This only works from the main thread and on platforms which have the signal.
+
+        Args:
+            signal_number (Union[int, None], optional): The signal which triggers a reload. Defaults to SIGHUP.
+
+        Returns:
+            bool: whether the signal handler has been installed.
+        """
+        if signal_number is None or threading.current_thread() is not threading.main_thread():
+            return False
+        signal.signal(signal_number, lambda signum, frame: self.reload())
+        return True
+
+    def watch(self, interval: float = 1.0) -> threading.Thread:
+        """Reload the settings whenever the .env file changes, by polling it from a daemon thread.
+
+        Args:
+            interval (float, optional): The number of seconds between two checks. Defaults to 1.0.
+
+        Returns:
+            threading.Thread: The watching thread.
+        """
+        def poll() -> None:
+            while True:
+                time.sleep(interval)
+                if self.get_env_mtime() != self.env_mtime:
+                    self.reload()
+
+        watcher = threading.Thread(target=poll, name="settings-watcher", daemon=True)
+        watcher.start()
+        return watcher
@@ -0,0 +1,289 @@
+import hashlib
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Set, Union
+
+from instrumentation import NULL_INSTRUMENTATION, Instrumentation
+from settings import SettingsManager
+
+
+class SpeechBackend(ABC):
+    """Abstract class for defining the behaviour of the text-to-speech backends.
+    A backend is only used from the thread of the SpeechWorker.
+    """
+
+    @abstractmethod
+    def say(self, text: str) -> None:
+        """Speak the text, blocking until it has been spoken.
+        """
+        ...
+
+    def synthesize(self, text: str, file_path: Path) -> bool:
+        """Write the speech of the text to an audio file.
+
+        Returns:
+            bool: whether the backend supports synthesizing to a file.
+        """
+        return False
+
+    def play(self, file_path: Path) -> bool:
+        """Play an audio file made by synthesize, blocking until it has been played.
+
+        Returns:
+            bool: whether the backend was able to play the file.
+        """
+        return False
+
+    def get_voice_key(self) -> str:
+        """Get a description of the voice, synthesized audio is only reused for the same voice.
+        """
+        return type(self).__name__
+
+
+class Pyttsx3Backend(SpeechBackend):
+    """Speaks using a single pyttsx3 engine, which is set up once on first use.
+    The voice, rate and volume are read from the current settings for every utterance, so a reload of the settings applies to the next utterance.
+    """
+
+    def __init__(self, settings: SettingsManager) -> None:
+        """Initialize the backend.
+
+        Args:
+            settings (SettingsManager): The holder of the settings with the text-to-speech variables.
+        """
+        self.settings = settings
+        self.engine = None
+        # the (rate, voice, volume) the engine has been set up with
+        self.engine_settings = None
+        # an external player for the cached audio files, when one is available
+        self.player = next((player for player in ("afplay", "aplay", "paplay") if shutil.which(player)), None)
+
+    def get_engine(self):
+        """Get the engine, it is created in the thread which uses it (as pyttsx3 requires).
+        """
+        if self.engine is None:
+            # pyttsx3 is only imported when text-to-speech is actually used
+            import pyttsx3
+            self.engine = pyttsx3.init()
+
+        settings = self.settings.current
+        if self.engine_settings != (settings.tts_rate, settings.tts_voice, settings.tts_volume):
+            # the settings have been (re)loaded since the engine was set up
+            self.engine.setProperty('rate', settings.tts_rate)
+            self.engine.setProperty('voice', self.engine.getProperty('voices')[settings.tts_voice].id)
+            self.engine.setProperty('volume', settings.tts_volume)
+            self.engine_settings = (settings.tts_rate, settings.tts_voice, settings.tts_volume)
+        return self.engine
+
+    def say(self, text: str) -> None:
+        engine = self.get_engine()
+        engine.say(text)
+        engine.runAndWait()
+
+    def synthesize(self, text: str, file_path: Path) -> bool:
+        if self.player is None and sys.platform != "win32":
+            # there is no way to play the file afterwards
+            return False
+        engine = self.get_engine()
+        engine.save_to_file(text, str(file_path))
+        engine.runAndWait()
+        return file_path.exists()
+
+    def play(self, file_path: Path) -> bool:
+        if sys.platform == "win32":
+            import winsound
+            winsound.PlaySound(str(file_path), winsound.SND_FILENAME)
+            return True
+        if self.player is None:
+            return False
+        return subprocess.run([self.player, str(file_path)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+    def get_voice_key(self) -> str:
+        settings = self.settings.current
+        return f"pyttsx3-{settings.tts_voice}-{settings.tts_rate}-{settings.tts_volume}"
+
+
+class NullBackend(SpeechBackend):
+    """A silent backend which only remembers what it was asked to say, for tests.
+    """
+
+    def __init__(self) -> None:
+        self.spoken: List[str] = []
+
+    def say(self, text: str) -> None:
+        self.spoken.append(text)
+
+
+class FileBackend(SpeechBackend):
+    """A stand-in backend which writes the texts to a file instead of speaking them, for tests.
+    The synthesized 'audio' files simply hold the text.
+    """
+
+    def __init__(self, file_path: Path) -> None:
+        """Initialize the backend.
+
+        Args:
+            file_path (Path): The file to append the spoken texts to.
+        """
+        self.file_path = file_path
+
+    def say(self, text: str) -> None:
+        with open(self.file_path, "a") as f:
+            f.write(f"{text}\n")
+
+    def synthesize(self, text: str, file_path: Path) -> bool:
+        file_path.write_text(text)
+        return True
+
+    def play(self, file_path: Path) -> bool:
+        self.say(file_path.read_text())
+        return True
+
+
+class SpeechWorker:
+    """Speaks the system utterances on a background thread, so the dialog can continue while speech plays.
+    The texts wait in a bounded queue, when it is full the oldest waiting text is dropped.
+    Fixed sentences are synthesized to audio files once (while the worker is idle) and replayed from this cache.
+    The audio is cached per voice of the backend, when a reload of the settings changes the voice the fixed sentences are synthesized again.
+    """
+    # put on the queue to stop the worker
+    stop_signal = None
+
+    def __init__(self, backend: SpeechBackend, max_queue_size: int = 16, cache_dir: Union[Path, None] = None, cache_sentences: List[str] = (),
+                    instrumentation: Instrumentation = NULL_INSTRUMENTATION) -> None:
+        """Start the worker.
+
+        Args:
+            backend (SpeechBackend): The backend doing the actual speech.
+            max_queue_size (int, optional): The maximum number of texts waiting to be spoken. Defaults to 16.
+            cache_dir (Union[Path, None], optional): The directory for the synthesized audio, None disables the cache. Defaults to None.
+            cache_sentences (List[str], optional): The fixed sentences to synthesize ahead of time. Defaults to ().
+            instrumentation (Instrumentation, optional): Where the speech timings are recorded. Defaults to NULL_INSTRUMENTATION (disabled).
+        """
+        self.backend = backend
+        self.queue: "queue.Queue[Union[str, None]]" = queue.Queue(maxsize=max_queue_size)
+        self.cache_dir = cache_dir
+        self.cache_sentences = list(cache_sentences) if cache_dir is not None else []
+        # the synthesized audio files of the current voice and the fixed sentences which still have to be synthesized for it
+        self.audio_cache: Set[Path] = set()
+        self.pending_sentences: List[str] = []
+        # the voice of the cached audio, None until the worker has started
+        self.voice_key: Union[str, None] = None
+        self.instrumentation = instrumentation
+        self.thread = threading.Thread(target=self.run, name="speech-worker", daemon=True)
+        self.thread.start()
+
+    def speak(self, text: str) -> None:
+        """Queue a text to be spoken, without waiting for the speech.
+
+        Args:
+            text (str): The text to speak.
+        """
+        while True:
+            try:
+                self.queue.put_nowait(text)
+                return
+            except queue.Full:
+                # drop the oldest waiting text, the newest one is the most relevant to the user
+                try:
+                    self.queue.get_nowait()
+                    self.instrumentation.count("tts", "dropped")
+                except queue.Empty:
+                    pass
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the worker after the queued texts have been spoken, without waiting longer than the timeout.
+
+        Args:
+            timeout (float, optional): The maximum number of seconds to wait. Defaults to 10.0.
+        """
+        if not self.thread.is_alive():
+            return
+        # like speak, the oldest waiting text makes room for the stop signal when the queue is full
+        self.speak(self.stop_signal)
+        self.thread.join(timeout)
+
+    def get_cache_path(self, text: str) -> Path:
+        """Get the location of the synthesized audio of a text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            Path: The path to the audio file.
+        """
+        key = hashlib.sha1(f"{self.backend.get_voice_key()}\n{text}".encode()).hexdigest()
+        return self.cache_dir / f"{key}.wav"
+
+    def cache_sentence(self, text: str) -> None:
+        """Synthesize the audio of a text into the cache, unless it is already there.
+
+        Args:
+            text (str): The text.
+        """
+        file_path = self.get_cache_path(text)
+        if file_path.exists() or self.backend.synthesize(text, file_path):
+            self.audio_cache.add(file_path)
+
+    def follow_voice(self) -> None:
+        """Start caching the fixed sentences again when the voice of the backend has changed, like after a reload of the settings.
+        """
+        voice_key = self.backend.get_voice_key()
+        if voice_key != self.voice_key:
+            self.voice_key = voice_key
+            self.audio_cache.clear()
+            self.pending_sentences = list(self.cache_sentences)
+
+    def run(self) -> None:
+        """The loop of the background thread.
+        """
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        while True:
+            if self.cache_dir is not None:
+                try:
+                    self.follow_voice()
+                except Exception as error:
+                    self.report_failure(error)
+            try:
+                text = self.queue.get(timeout=0.1 if self.pending_sentences else None)
+            except queue.Empty:
+                # nothing to say, use the time to fill the cache
+                try:
+                    with self.instrumentation.span("tts_synthesize"):
+                        self.cache_sentence(self.pending_sentences.pop())
+                except Exception as error:
+                    self.report_failure(error)
+                continue
+
+            if text is self.stop_signal:
+                return
+
+            # a failing backend costs the utterance, not the worker
+            try:
+                with self.instrumentation.span("tts_speak"):
+                    # the audio is looked up under the current voice, so a changed voice is not played from the old files
+                    file_path = self.get_cache_path(text) if self.cache_dir is not None else None
+                    if file_path in self.audio_cache and self.backend.play(file_path):
+                        self.instrumentation.count("tts", "cached")
+                    else:
+                        self.backend.say(text)
+                        self.instrumentation.count("tts", "live")
+            except Exception as error:
+                self.report_failure(error)
+
+    def report_failure(self, error: Exception) -> None:
+        """Report an error of the backend, the dialog goes on without the speech.
+
+        Args:
+            error (Exception): The error raised by the backend.
+        """
+        self.instrumentation.count("tts", "failed")
+        print(f"Text-to-speech failed: {type(error).__name__}: {error}", file=sys.stderr)
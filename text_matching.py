@@ -0,0 +1,149 @@
+import Levenshtein
+
+from typing import Any, Dict, Iterable, Iterator, List, Set, Tuple
+
+
+class KeywordAutomaton:
+    """An Aho-Corasick automaton which finds every occurrence of a set of keywords in a text in a single pass.
+    Every keyword carries a payload which is reported whenever the keyword occurs in the text.
+    """
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]) -> None:
+        """Compile the keywords into the automaton.
+
+        Args:
+            keywords (Iterable[Tuple[str, Any]]): The keywords together with their payloads, a keyword may occur more than once.
+        """
+        # state 0 is the root of the trie
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Any]] = [[]]
+
+        # build the trie of the keywords
+        for keyword, payload in keywords:
+            state = 0
+            for char in keyword:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(payload)
+
+        # add the failure links in breadth first order, so the outputs of the suffixes can be merged in
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+                queue.append(next_state)
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, Any]]:
+        """Find all occurrences of the keywords in the text, overlapping occurrences included.
+
+        Args:
+            text (str): The text to search in.
+
+        Yields:
+            Iterator[Tuple[int, Any]]: The end position of each occurrence and the payload of its keyword.
+        """
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        # empty keywords occur in every text
+        for payload in outputs[0]:
+            yield 0, payload
+
+        state = 0
+        for position, char in enumerate(text, start=1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if state:
+                for payload in outputs[state]:
+                    yield position, payload
+
+
+class FuzzyIndex:
+    """A symmetric deletion index (as in SymSpell) for finding all entries within a small edit distance of a query.
+    Every entry is indexed under all strings obtained by deleting up to max_distance characters from its prefix, a query
+    generates the same deletions of its own prefix, so the candidates are found with a few dictionary lookups instead of
+    a comparison with every entry. The candidates are checked with an edit distance which stops as soon as it exceeds the maximum.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]], max_distance: int = 3, prefix_length: int = 7) -> None:
+        """Build the index over the entries.
+
+        Args:
+            entries (Iterable[Tuple[str, Any]]): The entries together with their payloads, an entry may occur more than once.
+            max_distance (int, optional): The maximum edit distance served from the index. Defaults to 3.
+            prefix_length (int, optional): The number of leading characters which are indexed, longer prefixes use more memory. Defaults to 7.
+        """
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.entries: List[Tuple[str, Any]] = list(entries)
+        # the ids of the entries per deletion of their prefix
+        self.deletes: Dict[str, List[int]] = {}
+        for entry_id, (entry, _) in enumerate(self.entries):
+            for deletion in self.get_deletions(entry[:prefix_length], max_distance):
+                self.deletes.setdefault(deletion, []).append(entry_id)
+
+    @staticmethod
+    def get_deletions(word: str, max_distance: int) -> Set[str]:
+        """Get all strings obtained by deleting up to a number of characters from a word.
+
+        Args:
+            word (str): The word.
+            max_distance (int): The maximum number of deleted characters.
+
+        Returns:
+            Set[str]: The word and all its deletions.
+        """
+        deletions = {word}
+        frontier = [word]
+        for _ in range(max_distance):
+            next_frontier = []
+            for candidate in frontier:
+                for i in range(len(candidate)):
+                    deletion = candidate[:i] + candidate[i + 1:]
+                    if deletion not in deletions:
+                        deletions.add(deletion)
+                        next_frontier.append(deletion)
+            frontier = next_frontier
+        return deletions
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str, Any]]:
+        """Find all entries within the maximum distance of the query.
+
+        Args:
+            word (str): The query.
+            max_distance (int): The maximum (inclusive) edit distance, at most the maximum distance of the index.
+
+        Raises:
+            ValueError: When the maximum distance is larger than the maximum distance of the index.
+
+        Returns:
+            List[Tuple[int, str, Any]]: The distance, the entry and the payload of every match.
+        """
+        if max_distance < 0:
+            return []
+        if max_distance > self.max_distance:
+            raise ValueError(f"The index only finds entries within a distance of {self.max_distance}, not {max_distance}")
+
+        candidates = set()
+        for deletion in self.get_deletions(word[:self.prefix_length], max_distance):
+            candidates.update(self.deletes.get(deletion, ()))
+
+        matches = []
+        for entry_id in candidates:
+            entry, payload = self.entries[entry_id]
+            if abs(len(entry) - len(word)) > max_distance:
+                continue
+            distance = Levenshtein.distance(word, entry, score_cutoff=max_distance)
+            if distance <= max_distance:
+                matches.append((distance, entry, payload))
+        return matches
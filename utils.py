@@ -1,11 +1,14 @@
 import csv
-import pandas as pd
+import hashlib
+import random
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
 
-from sklearn.model_selection import train_test_split
+# pandas and sklearn are heavy to import and only needed for training
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 @dataclass
@@ -54,7 +57,7 @@ def load_restaurants(file_path: Path) -> List[Restaurant]:
     return restaurants
 
 
-def load_restaurant_train_test_split(file_path: Path, test_size: float=0.15, seed: int=42) -> Tuple[pd.DataFrame, pd.DataFrame]:
+def load_restaurant_train_test_split(file_path: Path, test_size: float=0.15, seed: int=42) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
     """Function to load and process the dialog_acts.dat file.
     strips the dialog acts from the utterances and does a stratified train/test split
 
@@ -66,14 +69,11 @@ def load_restaurant_train_test_split(file_path: Path, test_size: float=0.15, see
     Returns:
         Tuple[pd.DataFrame, pd.DataFrame]: Returns the train and test datasets.
     """
-    
-    # Load the dataset
-    with open(file_path) as f:
-        # convert to lower and remove the \n
-        data = list(map(lambda x: x.lower().replace("\n", ""), f.readlines()))
-    
-    # extract the dialog acts from the string
-    data = [(x.split(" ")[0], " ".join(x.split(" ")[1:])) for x in data]
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    # Load the dataset and extract the dialog acts from the utterances
+    data = list(iter_dialog_acts(file_path))
 
     # set it to a pandas dataframe
     header = ["dialog_act", "utterance_content"]
@@ -86,3 +86,115 @@ def load_restaurant_train_test_split(file_path: Path, test_size: float=0.15, see
                                     stratify=df_data["dialog_act"])
     
     return df_train, df_test
+
+
+def file_digest(file_path: Path) -> str:
+    """Compute the sha256 digest of the contents of a file.
+
+    Args:
+        file_path (Path): The path to the file.
+
+    Returns:
+        str: The hexadecimal digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        # read the file in chunks so large corpora don't have to fit in memory
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_dialog_acts(file_path: Path) -> Iterator[Tuple[str, str]]:
+    """Lazily parse a file with '<dialog act> <utterance>' lines, like dialog_acts.dat.
+    Only a single line is held in memory at a time.
+
+    Args:
+        file_path (Path): The path to the file.
+
+    Yields:
+        Iterator[Tuple[str, str]]: The lowercased dialog act and utterance of every line.
+    """
+    with open(file_path) as f:
+        for line in f:
+            dialog_act, _, utterance = line.lower().replace("\n", "").partition(" ")
+            yield dialog_act, utterance
+
+
+class StreamingStratifiedSplit:
+    """Assigns the items of a stream to the train or the test split in a single pass, stratified on the label.
+    Every item of a label goes to the test split with a probability that steers the number of test items of the label
+    towards test_size times the number of items seen so far, so every label ends up within one item of its exact share.
+    Only a pair of counters per label is kept and the split is deterministic for a seed and the order of the stream.
+    """
+
+    def __init__(self, test_size: float = 0.15, seed: int = 42) -> None:
+        """Initialize the split.
+
+        Args:
+            test_size (float, optional): The size of the test split. Defaults to 0.15.
+            seed (int, optional): The value of the random seed. Defaults to 42.
+        """
+        self.test_size = test_size
+        self.rng = random.Random(seed)
+        # the number of seen items and the number of test items per label
+        self.counts: Dict[str, List[int]] = {}
+
+    def is_test(self, label: str) -> bool:
+        """Decide whether the next item of a label belongs to the test split.
+
+        Args:
+            label (str): The label of the item.
+
+        Returns:
+            bool: whether the item belongs to the test split.
+        """
+        counts = self.counts.setdefault(label, [0, 0])
+        counts[0] += 1
+        # the number of test items the label is short of, compared to its exact share
+        shortage = counts[0] * self.test_size - counts[1]
+        is_test = self.rng.random() < shortage
+        if is_test:
+            counts[1] += 1
+        return is_test
+
+
+def stream_train_test_split(file_path: Path, split: str = "train", test_size: float = 0.15, seed: int = 42) -> Iterator[Tuple[str, str]]:
+    """Lazily load one side of a stratified train/test split of a dialog acts file, in a single pass over the file.
+    Both sides can be streamed separately, the split is the same for the same file, test size and seed.
+
+    Args:
+        file_path (Path): The path to the dialog_acts.dat file.
+        split (str, optional): Either "train" or "test". Defaults to "train".
+        test_size (float, optional): The size of the test split. Defaults to 0.15.
+        seed (int, optional): The value of the random seed. Defaults to 42.
+
+    Yields:
+        Iterator[Tuple[str, str]]: The dialog act and utterance of every line in the split.
+    """
+    want_test = split == "test"
+    splitter = StreamingStratifiedSplit(test_size=test_size, seed=seed)
+    for dialog_act, utterance in iter_dialog_acts(file_path):
+        if splitter.is_test(dialog_act) == want_test:
+            yield dialog_act, utterance
+
+
+def iter_batches(items: Iterable[Tuple[str, str]], batch_size: int = 10000) -> Iterator[Tuple[List[str], List[str]]]:
+    """Group a stream of (dialog act, utterance) pairs into mini-batches.
+
+    Args:
+        items (Iterable[Tuple[str, str]]): The stream of dialog acts and utterances.
+        batch_size (int, optional): The maximum number of items in a batch. Defaults to 10000.
+
+    Yields:
+        Iterator[Tuple[List[str], List[str]]]: The utterances and the dialog acts of every batch.
+    """
+    X, y = [], []
+    for dialog_act, utterance in items:
+        X.append(utterance)
+        y.append(dialog_act)
+        if len(X) >= batch_size:
+            yield X, y
+            X, y = [], []
+    if X:
+        yield X, y